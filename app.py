@@ -3,18 +3,45 @@
 #----------------------------------------------------------------------------#
 
 
+import io
 import json
+import time
+import contextvars
+import functools
+import base64
+import hmac
+import string
+import itertools
 import dateutil.parser
 import babel
 from flask import Flask, render_template, request, Response, flash, redirect
-from flask import url_for, jsonify
+from flask import url_for, jsonify, abort, Blueprint, stream_with_context
+from flask import g, session, has_request_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
 from flask_migrate import Migrate
+from sqlalchemy import event, orm, create_engine
+from sqlalchemy.engine.url import make_url
+from werkzeug.local import get_ident
+from sqlalchemy.dialects import postgresql
 import logging
-from logging import Formatter, FileHandler
+from logging import FileHandler
 from flask_wtf import Form
+from jinja2 import ChoiceLoader, ModuleLoader
+import os
+import sys
+import click
 from forms import *
+from autocomplete import NameIndex
+from explain import query_plan, sequential_scans
+from cache import ResponseCache
+from importer import ImportReport, read_rows, validate, batches, insert_batch
+from exporter import export_lines
+from seed import CatalogGenerator
+from replicas import ReplicaSet
+from instrumentation import JSONFormatter, QueryInstrumentation
+from metrics import Metrics
+import partitions
 from datetime import datetime
 
 
@@ -23,35 +50,246 @@ from datetime import datetime
 #----------------------------------------------------------------------------#
 
 
+# engine and pool settings built from the DB_* config
+def engine_options(config, uri):
+    url = make_url(uri)
+    if url.get_backend_name() != 'postgresql':
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+    # let psycopg2 send executemany batches as multi-row inserts
+    if url.get_driver_name() == 'psycopg2':
+        options['executemany_mode'] = 'values'
+
+    # pgbouncer rejects startup options, the timeout is set on begin instead
+    timeout = config['DB_STATEMENT_TIMEOUT']
+    if timeout and not config['DB_PGBOUNCER']:
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout:d}'}
+
+    return options
+
+
+# a session reading from a replica while the request allows it; flushes and
+# everything outside such a request go to the primary. The replica is picked
+# once per request, so all of its reads see the same point in time
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_request_context() and g.get('use_replica'):
+            if 'replica' not in g:
+                g.replica = replicas.pick()
+            if g.replica is not None:
+                return g.replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+# whose database session db.session is: the current thread's (or greenlet's,
+# as for flask's contexts), unless the code runs in an asyncio task asgi.py
+# gave an ident of its own in task_ident, as the requests it serves on its
+# event loop all share the loop's thread
+task_ident = contextvars.ContextVar('task_ident', default=None)
+
+
+def scope_ident():
+    ident = task_ident.get()
+    return get_ident() if ident is None else ident
+
+
 app = Flask(__name__)
-moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+if app.config['MOMENT_ENABLED']:
+    moment = Moment(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+db = RoutingSQLAlchemy(app, session_options={'scopefunc': scope_ident})
+
+# read replicas for the read-only handlers
+replicas = ReplicaSet([create_engine(uri, **engine_options(app.config, uri))
+                       for uri in app.config['SQLALCHEMY_REPLICA_URIS']],
+                      retry_after=app.config['REPLICA_RETRY_SECONDS'])
+
+# pgbouncer rejects startup options, so set the timeout on every begin of the
+# app's own engines
+if app.config['DB_STATEMENT_TIMEOUT'] and app.config['DB_PGBOUNCER']:
+    for engine in [db.engine] + replicas.engines:
+        event.listen(engine, 'begin', lambda conn: conn.execute(
+            f"SET LOCAL statement_timeout = {app.config['DB_STATEMENT_TIMEOUT']:d}"))
 
 migrate = Migrate(app, db)
 
+# in-memory name indexes serving the type-ahead endpoints
+venue_names = NameIndex()
+artist_names = NameIndex()
+
+# rendered read-only pages, invalidated by the submission handlers
+response_cache = ResponseCache(app)
+
+# query counts and timings per request, and the slow query log
+instrumentation = QueryInstrumentation(app)
+
+
+# whether the request may see the internal endpoints: always in debug mode,
+# otherwise only with the INTERNAL_TOKEN or straight from the
+# INTERNAL_ADDRESSES; a forwarded request comes from the proxy's address, so
+# the addresses only count for requests no proxy forwarded
+def internal_request():
+    if app.debug:
+        return True
+
+    token = app.config['INTERNAL_TOKEN']
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token):
+        return True
+
+    forwarded = 'Forwarded' in request.headers or 'X-Forwarded-For' in request.headers
+    return not forwarded and request.remote_addr in app.config['INTERNAL_ADDRESSES']
+
+
+# hide a view from everyone but internal requests
+def internal_only(view):
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not internal_request():
+            abort(404)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+# request, template, database, cache and pool metrics served at /metrics
+if app.config['METRICS_ENABLED']:
+    metrics = Metrics(app, lambda: dict(primary=db.engine, **{
+        'replica{}'.format(i): engine for i, engine in enumerate(replicas.engines)}),
+        allowed=internal_request)
+
 
 #----------------------------------------------------------------------------#
 # Helpers
 #----------------------------------------------------------------------------#
 
 
-# return the number of upcoming shows, or zero if there are not any
-def num_upcoming_shows(shows):
-    num_upcoming_shows = 0
-    for show in shows:
-        if show.start_time > datetime.now():
-            num_upcoming_shows += 1
-    return num_upcoming_shows
+# past and upcoming show counts for the given ids, grouped by the given show
+# column (Show.venue_id or Show.artist_id)
+def show_counts_query(column, ids):
+    now = datetime.now()
+    return db.session.query(
+        column,
+        db.func.count(db.case([(Show.start_time < now, Show.id)])),
+        db.func.count(db.case([(Show.start_time > now, Show.id)]))
+    ).filter(column.in_(ids)).group_by(column)
+
+
+# count the past and upcoming shows in sql for many venues or artists at once
+def show_counts(column, ids):
+    counts = {id: {"past_shows_count": 0, "upcoming_shows_count": 0} for id in ids}
+
+    # nothing to count, skip the round trip
+    if not counts:
+        return counts
 
+    for id, past, upcoming in show_counts_query(column, list(counts)):
+        counts[id] = {"past_shows_count": past, "upcoming_shows_count": upcoming}
 
-# return the number of past shows, of zero if there are not any
-def num_past_shows(shows):
-    num_past_shows = 0
-    for show in shows:
-        if show.start_time < datetime.now():
-            num_past_shows += 1
-    return num_past_shows
+    return counts
+
+
+# past and upcoming show counts keyed by venue id
+def venue_show_counts(venue_ids):
+    return show_counts(Show.venue_id, venue_ids)
+
+
+# past and upcoming show counts keyed by artist id
+def artist_show_counts(artist_ids):
+    return show_counts(Show.artist_id, artist_ids)
+
+
+# encode the sort key values of a row as an opaque, url safe page cursor
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+# decode a page cursor back into values typed like the sort columns; a
+# cursor that is not one of ours raises ValueError, whatever it holds
+def decode_cursor(cursor, columns):
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('cursor does not match the sort columns')
+    return [cursor_value(value, column) for value, column in zip(values, columns)]
+
+
+# a cursor value as the type of its sort column
+def cursor_value(value, column):
+    if isinstance(column.type, db.DateTime):
+        if not isinstance(value, str):
+            raise ValueError('cursor holds no time for ' + column.key)
+        try:
+            return dateutil.parser.parse(value)
+        except OverflowError:
+            raise ValueError('cursor time out of range')
+
+    if isinstance(column.type, db.Integer) and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError('cursor holds no integer for ' + column.key)
+    if isinstance(column.type, db.String) and not isinstance(value, str):
+        raise ValueError('cursor holds no text for ' + column.key)
+    return value
+
+
+# the page size asked for in the query string, bounded by the configured maximum
+def page_size(default):
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, app.config['MAX_PER_PAGE']))
+
+
+# fetch one page of a query with keyset pagination on the given sort columns,
+# which must end in a unique column and be selected by the query under their
+# own names; returns the rows and the cursors for the neighbouring pages
+def keyset_page(query, columns, per_page, after=None, before=None, descending=False):
+    key = db.tuple_(*columns)
+    backwards = before is not None
+
+    # walk away from the cursor, in reverse order when paging backwards
+    if backwards:
+        values = db.tuple_(*decode_cursor(before, columns))
+        query = query.filter(key > values if descending else key < values)
+    elif after is not None:
+        values = db.tuple_(*decode_cursor(after, columns))
+        query = query.filter(key < values if descending else key > values)
+
+    ascending = descending == backwards
+    order = [column.asc() if ascending else column.desc() for column in columns]
+
+    # one extra row tells us whether there is another page in this direction
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    has_prev = more if backwards else after is not None
+    has_next = True if backwards else more
+
+    return {
+        "items": rows,
+        "prev": cursor(rows[0]) if rows and has_prev else None,
+        "next": cursor(rows[-1]) if rows and has_next else None
+    }
 
 
 #----------------------------------------------------------------------------#
@@ -59,6 +297,10 @@ def num_past_shows(shows):
 #----------------------------------------------------------------------------#
 
 
+# genres are a postgres array, stored as json where arrays are unsupported so
+# the models can be created on sqlite for local testing
+GENRES_TYPE = postgresql.ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -70,11 +312,19 @@ class Venue(db.Model):
     phone = db.Column(db.String(120), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=True)
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(GENRES_TYPE, nullable=False)
     website = db.Column(db.String(240), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=False, default=True)
     seeking_description = db.Column(db.String(500), nullable=False, default='We are looking for artists to perform here!')
-    shows = db.relationship('Show', backref='venue', lazy=True)
+    shows = db.relationship('Show', backref='venue', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+        db.Index('ix_Venue_state', 'state'),
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
 
 class Artist(db.Model):
@@ -85,7 +335,7 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(GENRES_TYPE, nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=True)
     website = db.Column(db.String(240), nullable=True)
@@ -93,7 +343,20 @@ class Artist(db.Model):
     seeking_description = db.Column(db.String(500), nullable=False, default='Looking for a place to perform!')
     shows = db.relationship('Show', backref='artist', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_Artist_state', 'state'),
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+
+# the artists listing pages by upper case name
+db.Index('ix_Artist_upper_name', db.func.upper(Artist.name), Artist.id)
 
+
+# on postgres the migrations range partition Shows by month of start_time,
+# with (id, start_time) as its primary key; see partitions.py
 class Show(db.Model):
     __tablename__ = 'Shows'
 
@@ -102,29 +365,501 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_Shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Shows_start_time_id', 'start_time', 'id'),
+    )
+
+
+# the venues page as a table, one row per venue with its upcoming show count
+# and the start of its next show; refresh_venue_summary keeps it up to date
+# as venues and shows are written, and `flask refresh-venue-summary` as
+# upcoming shows become past ones
+class VenueSummary(db.Model):
+    __tablename__ = 'VenueSummary'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String, nullable=False)
+    upcoming_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show = db.Column(db.DateTime(), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_VenueSummary_area', 'city', 'state', 'venue_id'),
+        db.Index('ix_VenueSummary_next_show', 'next_show'),
+    )
+
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+
+# one row per venue with its upcoming show count, ordered so areas are
+# contiguous; a scan of the summary table in index order
+def venue_area_query():
+    return db.session.query(
+        VenueSummary.venue_id.label('id'), VenueSummary.name, VenueSummary.city, VenueSummary.state,
+        VenueSummary.upcoming_count.label('num_upcoming_shows')
+    ).order_by(VenueSummary.city, VenueSummary.state, VenueSummary.venue_id)
+
+
+# rebuild the summary rows of the given venues, or of every venue, from the
+# venues and their shows, in the caller's transaction
+def refresh_venue_summary(venue_ids=None):
+    db.session.flush()
+    table = VenueSummary.__table__
+    upcoming = db.and_(Show.venue_id == Venue.id, Show.start_time > datetime.now())
+    summary = db.session.query(
+        Venue.id, Venue.city, Venue.state, Venue.name,
+        db.func.count(Show.id), db.func.min(Show.start_time)
+    ).outerjoin(Show, upcoming).group_by(Venue.id)
+    columns = ['venue_id', 'city', 'state', 'name', 'upcoming_count', 'next_show']
+
+    # postgres updates the rows in place, so concurrent refreshes of a venue
+    # cannot both insert it, and deleting a venue deletes its row; sqlite
+    # replaces the rows instead
+    if db.engine.dialect.name == 'postgresql':
+        def refresh(query, ids=None):
+            insert = postgresql.insert(table).from_select(columns, query.statement)
+            db.session.execute(insert.on_conflict_do_update(
+                index_elements=[table.c.venue_id],
+                set_={name: insert.excluded[name] for name in columns if name != 'venue_id'}))
+    else:
+        def refresh(query, ids=None):
+            db.session.execute(table.delete() if ids is None else table.delete().where(table.c.venue_id.in_(ids)))
+            db.session.execute(table.insert().from_select(columns, query.statement))
+
+    if venue_ids is None:
+        refresh(summary)
+        return
+
+    for ids in batches(set(venue_ids), app.config['IMPORT_BATCH_SIZE']):
+        refresh(summary.filter(Venue.id.in_(ids)), ids)
+
+
+# the venues whose next show has started since their summary was built
+def stale_venue_summaries():
+    return [id for id, in db.session.query(VenueSummary.venue_id).filter(VenueSummary.next_show <= datetime.now())]
+
+
+# the venues with no summary row yet
+def missing_venue_summaries():
+    return [id for id, in db.session.query(Venue.id)
+            .outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id)
+            .filter(VenueSummary.venue_id.is_(None))]
+
+
+# build the areas -> venues -> upcoming count structure from a single query
+def venues_by_area():
+    areas = []
+    rows = venue_area_query().all()
+
+    # rows arrive sorted by area, so each area is one contiguous group
+    for (city, state), venues in itertools.groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in venues]
+        })
+
+    return areas
+
+
+# a shows query as upcoming rows then past rows, each labelled by a constant;
+# the start time bound on each half lets postgres prune the monthly
+# partitions of Shows that half cannot touch, where a per row CASE would
+# scan every partition the venue or artist ever played
+def upcoming_then_past(query):
+    now = datetime.now()
+    upcoming = query.filter(Show.start_time > now).add_columns(db.true().label('upcoming'))
+    past = query.filter(Show.start_time <= now).add_columns(db.false().label('upcoming'))
+    return upcoming.union_all(past)
+
+
+# a venue's shows with only the performing artist columns the page needs
+def venue_shows_query(venue_id):
+    return upcoming_then_past(db.session.query(
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time
+    ).join(Artist, Show.artist_id == Artist.id)
+        .filter(Show.venue_id == venue_id)).order_by(Show.start_time, Artist.id)
+
+
+# an artist's shows with only the venue columns the page needs
+def artist_shows_query(artist_id):
+    return upcoming_then_past(db.session.query(
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id)
+        .filter(Show.artist_id == artist_id)).order_by(Show.start_time, Venue.id)
+
+
+# the genre names a search term can match, from the form choices
+GENRES = [value for value, label in VenueForm.genres.kwargs['choices']]
+
+
+# escape like wildcards so a search term only ever matches literally
+def like_pattern(term, prefix=False):
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return term + '%' if prefix else '%' + term + '%'
+
+
+# match rows whose genres include the given genre
+def has_genre(model, genre):
+    if db.engine.dialect.name == 'postgresql':
+        return model.genres.contains(db.cast(postgresql.array([genre]), postgresql.ARRAY(db.String)))
+    return db.cast(model.genres, db.String).like(like_pattern(f'"{genre}"'), escape='\\')
+
+
+# a ranked (id, name) search over venues or artists; substring matches on the
+# name are served by the pg_trgm indexes on postgres and ranked by similarity,
+# elsewhere names starting with the term rank first
+def search_query(model, search_term):
+    term = search_term.strip()
+    matches = [model.name.ilike(like_pattern(term), escape='\\')]
+
+    # optionally widen the search to "City, ST", a state code or a genre; each
+    # match is a query of its own, united with the others, since postgres can
+    # serve each from its index but has to scan the table for them OR'ed
+    if app.config['SEARCH_EXTENDED'] and term:
+        city, comma, state = term.rpartition(',')
+        if comma:
+            matches.append(db.and_(model.city.ilike(like_pattern(city.strip(), prefix=True), escape='\\'),
+                                   model.state == state.strip().upper()))
+        else:
+            matches += [model.city.ilike(like_pattern(term), escape='\\'), model.state == term.upper()]
+
+        genre = next((genre for genre in GENRES if genre.lower() == term.lower()), None)
+        if genre:
+            matches.append(has_genre(model, genre))
+
+    queries = [db.session.query(model.id, model.name).filter(match) for match in matches]
+    query = queries[0].union(*queries[1:]) if len(queries) > 1 else queries[0]
+
+    if db.engine.dialect.name == 'postgresql':
+        rank = db.func.similarity(model.name, term).desc()
+    else:
+        rank = db.case([(model.name.ilike(like_pattern(term, prefix=True), escape='\\'), 0)], else_=1)
+
+    return query.order_by(rank, model.name, model.id)
+
+
+# shows with the artist and venue columns the listings need
+def shows_query():
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.venue_id,
+        Venue.name.label('venue_name')
+    ).join(Artist, Show.artist_id == Artist.id) \
+        .join(Venue, Show.venue_id == Venue.id)
+
+
+# every upcoming show with the artist and venue columns the listing needs
+def upcoming_shows_query():
+    return shows_query().filter(Show.start_time > datetime.now())
+
+
+# run a shows query and split its rows into upcoming and past show dicts
+def split_shows(query):
+    upcoming_shows = []
+    past_shows = []
+
+    for row in query:
+        show = row._asdict()
+        if show.pop("upcoming"):
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+
+    return upcoming_shows, past_shows
+
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+
+# the form validating each kind of imported row and the model it fills
+IMPORT_KINDS = {
+    'venues': (VenueForm, Venue),
+    'artists': (ArtistForm, Artist),
+    'shows': (ShowForm, Show)
+}
+
+
+# fill the name -> id cache for names not looked up yet, with one IN query
+def resolve_names(model, names, cache):
+    missing = {name for name in names if name and name not in cache}
+    if missing:
+        cache.update(dict.fromkeys(missing))
+        cache.update(db.session.query(model.name, model.id).filter(model.name.in_(missing)))
+
+
+# a show row may name its artist and venue instead of giving their ids
+def resolve_show(row, artists, venues):
+    row = dict(row)
+    for key, cache in (('artist', artists), ('venue', venues)):
+        name = row.pop(key, None)
+        if name and not row.get(key + '_id'):
+            if cache.get(name) is None:
+                return row, f'unknown {key} {name}'
+            row[key + '_id'] = cache[name]
+    return row, None
+
+
+# the column values of a validated row; columns left out of the row or blank
+# in it are left to the column defaults, not to the form's
+def import_values(form, model):
+    columns = model.__table__.columns
+    return {field.name: field.data for field in form
+            if field.name in columns and field.name != 'id' and field.raw_data}
+
+
+# validate and insert a stream of csv or jsonl rows in batches, reporting the
+# rows that fail without giving up on the rest
+def import_catalog(kind, stream, format):
+    form_class, model = IMPORT_KINDS[kind]
+    report = ImportReport(kind)
+    artists = {}
+    venues = {}
+    tags = {kind}
+
+    for batch in batches(read_rows(stream, format), app.config['IMPORT_BATCH_SIZE']):
+        rows = []
+
+        # look up every artist and venue name in the batch at once
+        if kind == 'shows':
+            resolve_names(Artist, [row.get('artist') for line, row, error in batch if row], artists)
+            resolve_names(Venue, [row.get('venue') for line, row, error in batch if row], venues)
+
+        for line, row, error in batch:
+            if not error and kind == 'shows':
+                row, error = resolve_show(row, artists, venues)
+            if not error:
+                form, error = validate(form_class, row)
+            if error:
+                report.error(line, error)
+                continue
+            rows.append((line, import_values(form, model)))
+
+        inserted = insert_batch(db.session, model.__table__, rows, report)
+        if kind == 'venues':
+            refresh_venue_summary(missing_venue_summaries())
+        elif kind == 'shows':
+            refresh_venue_summary(values['venue_id'] for line, values in inserted)
+        db.session.commit()
+
+        if kind == 'shows':
+            tags.add('venues')
+            for line, values in inserted:
+                tags.update([f"venue:{values['venue_id']}", f"artist:{values['artist_id']}"])
+
+    # new names go straight into the type-ahead indexes
+    if kind != 'shows':
+        build_name_indexes()
+    response_cache.invalidate(*tags)
+
+    return report
+
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+
+# the models each kind of export dumps
+EXPORT_KINDS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show
+}
+
+
+# stream every row of a table as csv or jsonl text, read through a server
+# side cursor a batch at a time so memory stays flat for any table size
+def export_catalog(kind, format):
+    columns = list(EXPORT_KINDS[kind].__table__.columns)
+    rows = db.session.query(*columns) \
+        .order_by(columns[0].table.c.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(app.config['EXPORT_YIELD_PER'])
+    return export_lines(rows, [column.name for column in columns], format)
+
+
+#----------------------------------------------------------------------------#
+# Seed.
+#----------------------------------------------------------------------------#
+
+
+# fill the tables with a synthetic catalog in bulk inserts of a batch each;
+# the same seed and anchor always give the same catalog on an empty database
+def seed_catalog(venues, artists, shows, seed=0, anchor=None):
+    generator = CatalogGenerator(seed, anchor)
+    size = app.config['IMPORT_BATCH_SIZE']
+
+    def insert(model, rows):
+        for batch in batches(rows, size):
+            db.session.execute(model.__table__.insert(), batch)
+            db.session.commit()
+
+    insert(Venue, generator.venues(venues))
+    insert(Artist, generator.artists(artists))
+
+    venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id)]
+    artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id)]
+    if venue_ids and artist_ids:
+        insert(Show, generator.shows(shows, venue_ids, artist_ids))
+
+    refresh_venue_summary()
+    db.session.commit()
+
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+# the babel patterns of the named formats of the datetime filter
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+# a babel pattern parsed once per format
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format):
+    return babel.dates.parse_pattern(format)
+
+
+# a babel locale loaded once per locale name
+@functools.lru_cache(maxsize=None)
+def datetime_locale(locale):
+    return babel.Locale.parse(locale)
+
+
+# format a datetime, or a string holding one, with a named format or a babel
+# pattern; pages repeat the same start times, so results are memoized
+@functools.lru_cache(maxsize=app.config['DATETIME_FILTER_CACHE_SIZE'])
+def format_datetime(value, format='medium', locale=None):
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=babel.dates.UTC)
+    locale = datetime_locale(locale or babel.dates.LC_TIME)
+
+    format = DATETIME_FORMATS.get(format, format)
+    if format in ('long', 'short'):
+        return babel.dates.format_datetime(date, format, locale=locale)
+    return datetime_pattern(format).apply(date, locale)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
 
 
+#----------------------------------------------------------------------------#
+# Templates.
+#----------------------------------------------------------------------------#
+
+
+# the template sources, which a precompiled bundle is built from
+template_sources = app.jinja_env.loader
+
+# serve the templates `flask compile-templates` built ahead of time, falling
+# back to the sources for any template the bundle lacks
+if app.config['TEMPLATE_BUNDLE'] and os.path.isdir(app.config['TEMPLATE_BUNDLE']):
+    app.jinja_env.loader = ChoiceLoader([ModuleLoader(app.config['TEMPLATE_BUNDLE']), template_sources])
+
+# load every template at startup, so no request pays to compile or import one
+if app.config['TEMPLATE_WARMUP']:
+    for name in template_sources.list_templates():
+        app.jinja_env.get_template(name)
+
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
+# serve a read-only view from a replica, unless this browser wrote something
+# moments ago and has to see its own change on the primary, or the response
+# cache is about to keep the page under a tag version only just invalidated
+def read_replica(view):
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = bool(replicas) and not g.get('read_primary') and \
+            session.get('_primary_until', 0) < time.time()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+# note a commit in this request so the browser can be pinned to the primary
+@event.listens_for(RoutingSession, 'after_commit')
+def note_write(db_session):
+    if has_request_context():
+        g.wrote = True
+
+
+# keep a browser that just wrote on the primary for a little while
+@app.after_request
+def pin_to_primary(response):
+    if g.pop('wrote', False) and replicas:
+        session['_primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+# load the type-ahead name indexes once, before serving the first request
+@app.before_first_request
+def build_name_indexes():
+    venue_names.build(db.session.query(Venue.id, Venue.name))
+    artist_names.build(db.session.query(Artist.id, Artist.name))
+
+
+# answer a type-ahead lookup from a name index as json, first reloading the
+# index when it is older than AUTOCOMPLETE_REFRESH_SECONDS
+def autocomplete(index, model):
+    if index.expired(app.config['AUTOCOMPLETE_REFRESH_SECONDS']):
+        index.build(db.session.query(model.id, model.name))
+
+    limit = request.args.get('limit', 10, type=int)
+    results = index.search(request.args.get('q', ''), min(limit, app.config['AUTOCOMPLETE_LIMIT']))
+    return jsonify({"data": [{"id": id, "name": name} for id, name in results]})
+
+
+# drop the cached pages showing a venue: its own page, the listings and the
+# pages of every artist that has a show there
+def invalidate_venue(venue_id, artist_ids=None):
+    if artist_ids is None:
+        artist_ids = [artist_id for artist_id, in
+                      db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+    response_cache.invalidate('venues', 'shows', f'venue:{venue_id}',
+                              *[f'artist:{artist_id}' for artist_id in artist_ids])
+
+
+# drop the cached pages showing an artist: its own page, the listings and the
+# pages of every venue it has a show at
+def invalidate_artist(artist_id):
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    response_cache.invalidate('artists', 'shows', f'artist:{artist_id}',
+                              *[f'venue:{venue_id}' for venue_id, in venue_ids])
+
+
 # homepage
 @app.route('/')
 def index():
@@ -137,33 +872,13 @@ def index():
 
 # show the venues grouped by location
 @app.route('/venues')
+@response_cache.cached(['venues'])
+@read_replica
 def venues():
-    data = []
 
     try:
-        # get the city state combos for the venues
-        areas = Venue.query.with_entities(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-
-        for area in areas:
-            # group the venues by location
-            locations = Venue.query.filter_by(city=area.city).filter_by(state=area.state).all()
-            # setup venues on each loop of areas
-            venues = []
-            # prepare venue data to append to location
-            for venue in locations:
-
-                venues.append({
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": num_upcoming_shows(venue.shows)
-                })
-
-            # setup the data
-            data.append({
-                "city": area.city,
-                "state": area.state,
-                "venues": venues
-            })
+        # areas, venues and upcoming show counts come from one aggregated query
+        data = venues_by_area()
 
         return render_template('pages/venues.html', areas=data)
 
@@ -176,20 +891,22 @@ def venues():
 
 # allow user to search venues by name
 @app.route('/venues/search', methods=['POST'])
+@read_replica
 def search_venues():
     data = []
     search_term = request.form.get('search_term', '')
 
     try:
-        # find venues matching the search term using ilike
-        venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
+        # find venues matching the search term, best matches first
+        venues = search_query(Venue, search_term).all()
+        counts = venue_show_counts([venue.id for venue in venues])
 
         # build the id, name and num upcoming shows for each venue in result
         for venue in venues:
             data.append({
               "id": venue.id,
               "name": venue.name,
-              "num_upcoming_shows": num_upcoming_shows(venue.shows)
+              "num_upcoming_shows": counts[venue.id]["upcoming_shows_count"]
             })
 
         # build response with the venue data
@@ -209,40 +926,19 @@ def search_venues():
 
 # show an individual venue page by venue id
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached(lambda venue_id: [f'venue:{venue_id}'])
+@read_replica
 def show_venue(venue_id):
     data = []
-    upcoming_shows = []
-    past_shows = []
 
     try:
 
         # get the venue data for the venue with this id
         venue = Venue.query.get(venue_id)
 
-        # join the show and artist tables to fetch artist name, image for venue
-        shows = db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id).all()
-
-        for show in shows:
-
-            # append the upcoming shows
-            if show.start_time > datetime.now():
-
-                upcoming_shows.append({
-                    "artist_id": show.artist_id,
-                    "artist_name": show.artist.name,
-                    "artist_image_link": show.artist.image_link,
-                    "start_time": str(show.start_time)
-                })
-
-            # append the past shows
-            elif show.start_time < datetime.now():
-
-                past_shows.append({
-                    "artist_id": show.artist_id,
-                    "artist_name": show.artist.name,
-                    "artist_image_link": show.artist.image_link,
-                    "start_time": str(show.start_time)
-                })
+        # one query for the artist columns of every show, the UNION ALL of its
+        # upcoming and past halves built by upcoming_then_past
+        upcoming_shows, past_shows = split_shows(venue_shows_query(venue_id))
 
         # build the data
         data = {
@@ -260,8 +956,8 @@ def show_venue(venue_id):
             "image_link": venue.image_link,
             "past_shows": past_shows,
             "upcoming_shows": upcoming_shows,
-            "past_shows_count": num_past_shows(venue.shows),
-            "upcoming_shows_count": num_upcoming_shows(venue.shows)
+            "past_shows_count": len(past_shows),
+            "upcoming_shows_count": len(upcoming_shows)
         }
 
         return render_template('pages/show_venue.html', venue=data)
@@ -273,6 +969,12 @@ def show_venue(venue_id):
         return render_template('pages/home.html')
 
 
+# type-ahead lookup of venue names by prefix or substring
+@app.route('/venues/autocomplete')
+def autocomplete_venues():
+    return autocomplete(venue_names, Venue)
+
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
@@ -307,7 +1009,11 @@ def create_venue_submission():
                       website=website, seeking_talent=seeking_talent,
                       seeking_description=seeking_description)
         db.session.add(venue)
+        db.session.flush()
+        refresh_venue_summary([venue.id])
         db.session.commit()
+        venue_names.add(venue.id, venue.name)
+        response_cache.invalidate('venues')
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
 
     except:
@@ -322,43 +1028,81 @@ def create_venue_submission():
 
 
 # allow deletion of a venue by venue id
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    status = 204
 
     # delete the venue for given id and flash success
     try:
 
-        Venue.query.get(venue_id).delete()
+        # its shows go with it, so note the artists whose pages list them
+        artist_ids = {show.artist_id for show in venue.shows}
+        db.session.delete(venue)
+        db.session.flush()
+        refresh_venue_summary([venue_id])
         db.session.commit()
+        venue_names.remove(venue_id)
+        invalidate_venue(venue_id, artist_ids)
         flash('Venue successfully deleted!')
 
     # rollback database session and flash error
-    except:
+    except Exception:
 
         db.session.rollback()
         flash('An error occurred while trying to delete.')
+        status = 500
 
     # close the database session
     finally:
 
         db.session.close()
 
-    return None
+    # the page that sent the request redirects once it is answered
+    return '', status
 
 
 #  Artists
 #  ----------------------------------------------------------------
 
 
-# show all the artists
+# show the artists a page at a time in name order
 @app.route('/artists')
+@response_cache.cached(['artists'])
+@read_replica
 def artists():
-    data = Artist.query.all()
-    return render_template('pages/artists.html', artists=data)
+    per_page = page_size(app.config['ARTISTS_PER_PAGE'])
+    after = request.args.get('after')
+    letter = request.args.get('letter', '')
+
+    # jumping to a letter starts the page just before the first name with it
+    if letter and letter in string.ascii_uppercase:
+        after = encode_cursor([letter, 0])
+
+    try:
+
+        # only the columns the listing prints, paged by (upper case name, id)
+        # so that names, and the letter jumps, sort alike whatever their case;
+        # sqlite compares text byte by byte, putting every lowercase name last
+        sort_name = db.func.upper(Artist.name, type_=db.String).label('sort_name')
+        query = db.session.query(Artist.id, Artist.name, Artist.image_link, sort_name)
+        page = keyset_page(query, (sort_name, Artist.id), per_page,
+                           after=after,
+                           before=request.args.get('before'))
+
+        return render_template('pages/artists.html', artists=page["items"], page=page,
+                               per_page=per_page, letters=string.ascii_uppercase)
+
+    # flash and send user home if the page cursor is bad
+    except:
+
+        flash('Not a valid page!')
+        return render_template('pages/home.html')
 
 
 # allow user to search for artists by name
 @app.route('/artists/search', methods=['POST'])
+@read_replica
 def search_artists():
 
     data = []
@@ -366,15 +1110,16 @@ def search_artists():
 
     try:
 
-        # find artists matching the search term using ilike
-        artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
+        # find artists matching the search term, best matches first
+        artists = search_query(Artist, search_term).all()
+        counts = artist_show_counts([artist.id for artist in artists])
 
         # put results in data
         for artist in artists:
             data.append({
               "id": artist.id,
               "name": artist.name,
-              "num_upcoming_shows": num_upcoming_shows(artist.shows)
+              "num_upcoming_shows": counts[artist.id]["upcoming_shows_count"]
             })
 
         # prepare respose with a count and the data
@@ -392,42 +1137,27 @@ def search_artists():
         return render_template('pages/home.html')
 
 
+# type-ahead lookup of artist names by prefix or substring
+@app.route('/artists/autocomplete')
+def autocomplete_artists():
+    return autocomplete(artist_names, Artist)
+
+
 # show the artist page given some artist id
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached(lambda artist_id: [f'artist:{artist_id}'])
+@read_replica
 def show_artist(artist_id):
     data = []
-    upcoming_shows = []
-    past_shows = []
 
     try:
 
         # get the artist data for the artist with this id
         artist = Artist.query.get(artist_id)
 
-        # join the shows and venue tables to have venue name, venue image
-        shows = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).all()
-
-        for show in shows:
-
-            # add the upcoming shows
-            if show.start_time > datetime.now():
-
-                upcoming_shows.append({
-                    "venue_id": show.venue_id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": str(show.start_time)
-                })
-
-            # add the past shows
-            elif show.start_time < datetime.now():
-
-                past_shows.append({
-                    "venue_id": show.venue_id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": str(show.start_time)
-                })
+        # one query for the venue columns of every show, the UNION ALL of its
+        # upcoming and past halves built by upcoming_then_past
+        upcoming_shows, past_shows = split_shows(artist_shows_query(artist_id))
 
         # build the data
         data = {
@@ -444,8 +1174,8 @@ def show_artist(artist_id):
             "image_link": artist.image_link,
             "past_shows": past_shows,
             "upcoming_shows": upcoming_shows,
-            "past_shows_count": num_past_shows(artist.shows),
-            "upcoming_shows_count": num_upcoming_shows(artist.shows)
+            "past_shows_count": len(past_shows),
+            "upcoming_shows_count": len(upcoming_shows)
         }
 
         return render_template('pages/show_artist.html', artist=data)
@@ -462,6 +1192,7 @@ def show_artist(artist_id):
 
 # allow user to see existing artist values before editing
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@read_replica
 def edit_artist(artist_id):
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
@@ -507,6 +1238,8 @@ def edit_artist_submission(artist_id):
         artist.seeking_venue = True
         artist.seeking_description = request.form['seeking_description']
         db.session.commit()
+        artist_names.add(artist_id, artist.name)
+        invalidate_artist(artist_id)
         flash('Artist ' + request.form['name'] + ' was successfully edited!')
 
     # rollback and flash if fail
@@ -526,6 +1259,7 @@ def edit_artist_submission(artist_id):
 
 # all user to see existing venue data before editing
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@read_replica
 def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
@@ -572,7 +1306,10 @@ def edit_venue_submission(venue_id):
         venue.website = request.form['website']
         venue.seeking_talent = True
         venue.seeking_description = request.form['seeking_description']
+        refresh_venue_summary([venue_id])
         db.session.commit()
+        venue_names.add(venue_id, venue.name)
+        invalidate_venue(venue_id)
         flash('Venue ' + request.form['name'] + ' was successfully edited!')
 
     # rollback session and flash error on fail
@@ -624,6 +1361,8 @@ def create_artist_submission():
                         seeking_description=seeking_description)
         db.session.add(artist)
         db.session.commit()
+        artist_names.add(artist.id, artist.name)
+        response_cache.invalidate('artists')
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
 
     # rollback session and flash on error
@@ -642,27 +1381,28 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-# show all the shows
+# show the upcoming shows a page at a time
 @app.route('/shows')
+@response_cache.cached(['shows'])
+@read_replica
 def shows():
-    query = Show.query.order_by(db.desc(Show.start_time))
-    data = []
+    per_page = page_size(app.config['SHOWS_PER_PAGE'])
 
-    # list the shows that are in future, not the past shows
-    for show in query:
+    try:
 
-        if show.start_time > datetime.now():
+        # upcoming shows are filtered in sql and paged by (start_time, id)
+        page = keyset_page(upcoming_shows_query(), (Show.start_time, Show.id), per_page,
+                           after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           descending=True)
 
-            data.append({
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time,
-                "venue_id": show.venue_id,
-                "venue_name": show.venue.name,
-            })
+        return render_template('pages/shows.html', shows=page["items"], page=page, per_page=per_page)
+
+    # flash and send user home if the page cursor is bad
+    except:
 
-    return render_template('pages/shows.html', shows=data)
+        flash('Not a valid page!')
+        return render_template('pages/home.html')
 
 
 # get the new show create form
@@ -685,7 +1425,9 @@ def create_show_submission():
         start_time = request.form['start_time']
         show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
         db.session.add(show)
+        refresh_venue_summary([int(venue_id)])
         db.session.commit()
+        response_cache.invalidate('venues', 'shows', f'venue:{venue_id}', f'artist:{artist_id}')
         flash('Show was successfully listed!')
 
     # rollback database session and flash on error
@@ -701,6 +1443,70 @@ def create_show_submission():
         return render_template('pages/home.html')
 
 
+#  Pool
+#  ----------------------------------------------------------------
+
+# the usage of an engine's connection pool
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if callable(getattr(pool, name, None)):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
+# connection pool usage of the worker process answering the request, for the
+# primary and each read replica
+@app.route('/debug/pool')
+@internal_only
+def pool_status():
+    return jsonify({"pid": os.getpid(), **pool_stats(db.engine),
+                    "replicas": [pool_stats(engine) for engine in replicas.engines]})
+
+
+#  Import
+#  ----------------------------------------------------------------
+
+# bulk import an uploaded csv or jsonl file of venues, artists or shows
+@app.route('/import/<kind>', methods=['POST'])
+@internal_only
+def import_upload(kind):
+    if kind not in IMPORT_KINDS:
+        abort(404)
+
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({"error": "Upload the rows as a file field named file"}), 400
+
+    format = request.form.get('format') or ('csv' if upload.filename.endswith('.csv') else 'jsonl')
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+
+    try:
+        report = import_catalog(kind, stream, format)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    return jsonify(report.to_dict())
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+# stream a full dump of the venues, artists or shows as csv or jsonl
+@app.route('/export/<kind>.<format>')
+@internal_only
+@read_replica
+def export_download(kind, format):
+    if kind not in EXPORT_KINDS or format not in ('csv', 'jsonl'):
+        abort(404)
+
+    mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_catalog(kind, format)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{format}'
+    return response
+
+
 # 404 error route
 @app.errorhandler(404)
 def not_found_error(error):
@@ -713,16 +1519,369 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
+# outside debug mode, errors and slow queries are logged to LOG_FILE as one
+# json object per line
+if app.config['LOG_FILE'] and not app.debug:
+    file_handler = FileHandler(app.config['LOG_FILE'])
+    file_handler.setFormatter(JSONFormatter())
     file_handler.setLevel(logging.INFO)
+    instrumentation.logger.addHandler(file_handler)
+    app.logger.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# the column fields each resource can return with ?fields=
+VENUE_FIELDS = ('id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                'genres', 'website', 'seeking_talent', 'seeking_description')
+ARTIST_FIELDS = ('id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                 'genres', 'website', 'seeking_venue', 'seeking_description')
+SHOW_FIELDS = ('id', 'start_time', 'artist_id', 'artist_name', 'artist_image_link', 'venue_id', 'venue_name')
+
+# fields computed from a venue's or artist's shows rather than its own row
+COUNT_FIELDS = ('past_shows_count', 'upcoming_shows_count')
+SHOWS_FIELDS = ('past_shows', 'upcoming_shows')
+
+
+# the fields asked for with ?fields=, or all of them
+def requested_fields(fields):
+    names = request.args.get('fields')
+    if not names:
+        return list(fields)
+
+    names = names.split(',')
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        abort(400, 'Unknown fields: ' + ', '.join(unknown))
+    return names
+
+
+# the ids asked for with ?ids=, or None to page through everything
+def requested_ids():
+    ids = request.args.get('ids')
+    if ids is None:
+        return None
+
+    try:
+        ids = [int(id) for id in ids.split(',')]
+    except ValueError:
+        abort(400, 'ids must be a comma separated list of integers')
+    if len(ids) > app.config['MAX_PER_PAGE']:
+        abort(400, f"At most {app.config['MAX_PER_PAGE']} ids can be fetched at once")
+    return ids
+
+
+# a row tuple as a json ready dict with only the given fields
+def serialize(row, names):
+    item = {}
+    for name in names:
+        value = getattr(row, name)
+        item[name] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+
+# a show dict from split_shows as a json ready dict
+def serialize_show(show):
+    return {name: value.isoformat() if isinstance(value, datetime) else value for name, value in show.items()}
+
+
+# a page of rows, or the rows for ?ids= from a single IN query
+def api_page(query, id_column, columns, descending=False):
+    ids = requested_ids()
+    if ids is not None:
+        return {"items": query.filter(id_column.in_(ids)).order_by(id_column).all(), "prev": None, "next": None}
+
+    try:
+        return keyset_page(query, columns, page_size(app.config['API_PER_PAGE']),
+                           after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           descending=descending)
+    except ValueError:
+        abort(400, 'Not a valid page cursor')
+
+
+# list venues or artists selecting only the requested columns, with show
+# counts for the whole page fetched in one grouped query when asked for
+def listing(model, fields, show_column):
+    names = requested_fields(fields + COUNT_FIELDS)
+    columns = [model.id] + [getattr(model, name) for name in names if name in fields and name != 'id']
+
+    page = api_page(db.session.query(*columns), model.id, (model.id,))
+    items = [serialize(row, ['id'] + [column.key for column in columns[1:]]) for row in page["items"]]
+
+    counts = [name for name in names if name in COUNT_FIELDS]
+    if counts:
+        show_count = show_counts(show_column, [item["id"] for item in items])
+        for item in items:
+            item.update({name: show_count[item["id"]][name] for name in counts})
+
+    # the id was only selected for paging and counting
+    if 'id' not in names:
+        for item in items:
+            del item["id"]
+
+    return jsonify({"data": items, "prev": page["prev"], "next": page["next"]})
+
+
+# one venue or artist with the requested columns and, when asked for, its
+# shows from the same split query the detail pages use
+def detail(model, fields, id, shows_query):
+    names = requested_fields(fields + COUNT_FIELDS + SHOWS_FIELDS)
+    columns = [getattr(model, name) for name in names if name in fields]
+
+    item = {}
+    if columns:
+        row = db.session.query(*columns).filter(model.id == id).first()
+        if row is None:
+            abort(404)
+        item = serialize(row, [column.key for column in columns])
+    elif not db.session.query(model.id).filter(model.id == id).first():
+        abort(404)
+
+    if any(name in COUNT_FIELDS + SHOWS_FIELDS for name in names):
+        upcoming_shows, past_shows = split_shows(shows_query(id))
+        shows = {
+            "past_shows": [serialize_show(show) for show in past_shows],
+            "upcoming_shows": [serialize_show(show) for show in upcoming_shows],
+            "past_shows_count": len(past_shows),
+            "upcoming_shows_count": len(upcoming_shows)
+        }
+        item.update({name: shows[name] for name in names if name in shows})
+
+    return jsonify({"data": item})
+
+
+@api.route('/venues')
+@read_replica
+def api_venues():
+    return listing(Venue, VENUE_FIELDS, Show.venue_id)
+
+
+@api.route('/venues/<int:venue_id>')
+@read_replica
+def api_venue(venue_id):
+    return detail(Venue, VENUE_FIELDS, venue_id, venue_shows_query)
+
+
+@api.route('/artists')
+@read_replica
+def api_artists():
+    return listing(Artist, ARTIST_FIELDS, Show.artist_id)
+
+
+@api.route('/artists/<int:artist_id>')
+@read_replica
+def api_artist(artist_id):
+    return detail(Artist, ARTIST_FIELDS, artist_id, artist_shows_query)
+
+
+# upcoming shows newest first like /shows, or any shows by ?ids=
+@api.route('/shows')
+@read_replica
+def api_shows():
+    names = requested_fields(SHOW_FIELDS)
+    query = shows_query() if request.args.get('ids') is not None else upcoming_shows_query()
+    page = api_page(query, Show.id, (Show.start_time, Show.id), descending=True)
+    items = [serialize(row, names) for row in page["items"]]
+    return jsonify({"data": items, "prev": page["prev"], "next": page["next"]})
+
+
+@api.route('/shows/<int:show_id>')
+@read_replica
+def api_show(show_id):
+    names = requested_fields(SHOW_FIELDS)
+    row = shows_query().filter(Show.id == show_id).first()
+    if row is None:
+        abort(404)
+    return jsonify({"data": serialize(row, names)})
+
+
+# api errors are json rather than the html error pages
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({"error": error.description}), error.code
+
+
+app.register_blueprint(api)
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+
+# the queries behind the hot pages, built for sample ids
+def hot_queries():
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar() or 0
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar() or 0
+    per_page = app.config['SHOWS_PER_PAGE']
+
+    return {
+        "venues": venue_area_query(),
+        "show_venue": venue_shows_query(venue_id),
+        "show_artist": artist_shows_query(artist_id),
+        "search_venues": show_counts_query(Show.venue_id, [venue_id]),
+        "search_artists": show_counts_query(Show.artist_id, [artist_id]),
+        "shows": upcoming_shows_query().order_by(Show.start_time.desc(), Show.id.desc()).limit(per_page + 1)
+    }
+
+
+@app.cli.command('explain')
+def explain_command():
+    """Check that the hot queries reach Shows through an index."""
+    failed = False
+
+    # ask whether an index can serve each query, however small the tables are
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('SET LOCAL enable_seqscan = off')
+
+    # a partitioned Shows is scanned through its partitions
+    tables = ['Shows', partitions.DEFAULT]
+    if shows_partitioned():
+        tables += [name for month, name, tablespace in partitions.monthly_partitions(db.session)]
+
+    for name, query in hot_queries().items():
+        plan = query_plan(db.session, query)
+        scans = sequential_scans(plan, tables)
+        click.echo(('FAIL ' if scans else 'ok   ') + name)
+        for line in plan:
+            click.echo('     ' + line)
+        failed = failed or bool(scans)
+
+    db.session.rollback()
+    if failed:
+        sys.exit(1)
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+def import_command(kind, file, format):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    format = format or ('csv' if file.name.endswith('.csv') else 'jsonl')
+    report = import_catalog(kind, file, format)
+
+    for line, message in sorted(report.errors):
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'{report.inserted} {kind} imported, {len(report.errors)} rows failed')
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORT_KINDS)))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), default='jsonl', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write to, standard output by default.')
+def export_command(kind, format, output):
+    """Stream all venues, artists or shows out as CSV or JSONL."""
+    for chunk in export_catalog(kind, format):
+        output.write(chunk)
+
+
+@app.cli.command('refresh-venue-summary')
+@click.option('--all', 'everything', is_flag=True, help='Rebuild every row rather than only the stale ones.')
+def refresh_venue_summary_command(everything):
+    """Move shows that have started from upcoming to past in the venue summary.
+
+    Run it every minute or so from cron; the venues page shows an upcoming
+    show until the next run after it starts."""
+    venue_ids = None if everything else stale_venue_summaries() + missing_venue_summaries()
+    refresh_venue_summary(venue_ids)
+    db.session.commit()
+    if venue_ids is None or venue_ids:
+        response_cache.invalidate('venues')
+    click.echo('every venue summary rebuilt' if venue_ids is None else f'{len(venue_ids)} venue summaries refreshed')
+
+
+# whether Shows is range partitioned, as the migrations leave it on postgres
+def shows_partitioned():
+    return db.engine.dialect.name == 'postgresql' and partitions.is_partitioned(db.session)
+
+
+@app.cli.command('shows-partitions')
+@click.option('--months-ahead', type=int, default=lambda: app.config['SHOWS_PARTITION_MONTHS_AHEAD'],
+              show_default='SHOWS_PARTITION_MONTHS_AHEAD',
+              help='How many months past the current one to have partitions for.')
+def shows_partitions_command(months_ahead):
+    """Create the monthly partitions of Shows that upcoming shows will need.
+
+    Run it monthly from cron; shows booked past the last partition land in
+    the default partition, which every query has to scan."""
+    if not shows_partitioned():
+        raise click.ClickException('Shows is not partitioned, run the migrations on postgres first')
+
+    this_month = partitions.month_start(datetime.now())
+    created = partitions.create_partitions(db.session, this_month, partitions.add_months(this_month, months_ahead))
+    db.session.commit()
+    click.echo(f'created {", ".join(created)}' if created else 'every partition exists already')
+
+
+@app.cli.command('archive-shows')
+@click.option('--older-than', type=int, default=lambda: app.config['SHOWS_ARCHIVE_AFTER_MONTHS'],
+              show_default='SHOWS_ARCHIVE_AFTER_MONTHS', help='Archive the partitions this many months old and older.')
+@click.option('--tablespace', default=lambda: app.config['SHOWS_ARCHIVE_TABLESPACE'],
+              help='Tablespace on cheaper storage to move the partitions to; it must exist already.')
+@click.option('--detach', is_flag=True,
+              help='Also detach the partitions, taking their shows out of every page and count.')
+def archive_shows_command(older_than, tablespace, detach):
+    """Move the partitions of old shows to cheaper storage."""
+    if not shows_partitioned():
+        raise click.ClickException('Shows is not partitioned, run the migrations on postgres first')
+    if not tablespace and not detach:
+        raise click.ClickException('give a --tablespace to move the partitions to, or --detach')
+
+    before = partitions.add_months(partitions.month_start(datetime.now()), -older_than)
+    archived = partitions.archive_partitions(db.session, before, tablespace, detach)
+    db.session.commit()
+
+    # the pages of every venue and artist with a detached show lose it
+    if archived and detach:
+        pages = set()
+        for name in archived:
+            for venue_id, artist_id in db.session.execute(
+                    f'SELECT DISTINCT venue_id, artist_id FROM {partitions.quote(name)}'):
+                pages.update([f'venue:{venue_id}', f'artist:{artist_id}'])
+        response_cache.invalidate('shows', 'venues', 'artists', *pages)
+    click.echo(f'archived {", ".join(archived)}' if archived else 'nothing to archive')
+
+
+@app.cli.command('compile-templates')
+@click.option('--output', default='templates_compiled', show_default=True,
+              help='Directory to write the bundle to, for TEMPLATE_BUNDLE.')
+def compile_templates_command(output):
+    """Compile every template ahead of time into a bundle of python modules."""
+    app.jinja_env.loader = template_sources
+    app.jinja_env.compile_templates(output, zip=None, ignore_errors=False)
+    click.echo(f'{len(template_sources.list_templates())} templates compiled into {output}')
+
+
+@app.cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=5000, show_default=True)
+@click.option('--shows', default=50000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same catalog.')
+@click.option('--anchor', type=click.DateTime(['%Y-%m-%d']),
+              help='The day shows are spread around, today by default.')
+def seed_command(venues, artists, shows, seed, anchor):
+    """Fill an empty database with a synthetic catalog for scale testing."""
+    if db.session.query(Venue.id).first() or db.session.query(Artist.id).first():
+        raise click.ClickException('the database already holds venues or artists')
+
+    started = time.time()
+    seed_catalog(venues, artists, shows, seed, anchor)
+    elapsed = time.time() - started
+    click.echo(f'{venues} venues, {artists} artists and {shows} shows seeded in {elapsed:.1f}s '
+               f'({(venues + artists + shows) / elapsed * 60:,.0f} rows per minute)')
+
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
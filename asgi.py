@@ -0,0 +1,385 @@
+# an ASGI entry point serving the venue and artist pages, and their API
+# detail views, from async handlers on asyncpg: the independent queries of a
+# detail page run at once on separate connections instead of one after the
+# other, and a worker waiting on postgres keeps serving other requests. Every
+# other route goes to the WSGI app on a thread pool, and so does everything
+# when asyncpg is missing, ASYNC_VIEWS is off or the database is not postgres.
+#
+#   pip install -r requirements-asgi.txt
+#   WEB_CONCURRENCY=4 uvicorn asgi:application
+
+import asyncio
+import collections
+import contextlib
+import functools
+import itertools
+import logging
+import time
+from a2wsgi import WSGIMiddleware
+from flask import g, request, session, render_template, _app_ctx_stack, _request_ctx_stack
+from sqlalchemy.dialects.postgresql.base import PGDialect, PGCompiler
+from sqlalchemy.engine.url import make_url
+from werkzeug.exceptions import HTTPException
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from app import app, db, task_ident, scope_ident, instrumentation, response_cache, split_shows, serialize, \
+    serialize_show, requested_fields, venue_shows_query, artist_shows_query, Venue, Artist, \
+    VENUE_FIELDS, ARTIST_FIELDS, COUNT_FIELDS, SHOWS_FIELDS
+
+
+logger = logging.getLogger('fyyur.asgi')
+
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+
+# compiles statements for asyncpg, whose placeholders are $1, $2, ...
+class AsyncpgCompiler(PGCompiler):
+
+    def bindparam_string(self, name, **kw):
+        placeholder = super().bindparam_string(name, **kw)
+        return '$' + placeholder[1:] if placeholder.startswith(':') else placeholder
+
+
+class AsyncpgDialect(PGDialect):
+    statement_compiler = AsyncpgCompiler
+    default_paramstyle = 'numeric'
+
+
+dialect = AsyncpgDialect(paramstyle='numeric')
+
+
+# rows as named tuples, like the rows of a Query
+@functools.lru_cache(maxsize=None)
+def row_type(names):
+    return collections.namedtuple('Row', names)
+
+
+# a query as the sql, arguments and row type asyncpg needs to run it; the sql
+# of a route is the same on every request, so asyncpg prepares it once per
+# connection
+def compile_query(query):
+    compiled = query.statement.compile(dialect=dialect)
+    params = compiled.construct_params()
+    names = tuple(column['name'] for column in query.column_descriptions)
+    return str(compiled), [params[name] for name in compiled.positiontup], row_type(names)
+
+
+# the dsn asyncpg takes for a sqlalchemy database url
+def dsn(uri):
+    url = make_url(uri)
+    url.drivername = 'postgresql'
+    return str(url)
+
+
+# a pool of asyncpg connections to the primary and one to each read replica
+class Databases(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.primary = None
+        self.replicas = []
+        self._order = None
+        self.timeout = config['DB_STATEMENT_TIMEOUT'] / 1000 or None
+
+    async def connect(self):
+        options = {'min_size': 1, 'max_size': self.config['DB_POOL_SIZE']}
+
+        # transaction mode pgbouncer hands each statement to any server
+        # connection, where a statement prepared on another is unknown
+        if self.config['DB_PGBOUNCER']:
+            options['statement_cache_size'] = 0
+
+        self.primary = await asyncpg.create_pool(dsn(self.config['SQLALCHEMY_DATABASE_URI']), **options)
+        self.replicas = [await asyncpg.create_pool(dsn(uri), **options)
+                         for uri in self.config['SQLALCHEMY_REPLICA_URIS']]
+        self._order = itertools.cycle(self.replicas)
+
+    async def close(self):
+        for pool in [self.primary] + self.replicas:
+            if pool is not None:
+                await pool.close()
+
+    # a replica in turn, or the primary when there are none
+    def pick(self, use_replica):
+        return next(self._order) if use_replica and self.replicas else self.primary
+
+    # run a compiled query and time it; a replica that fails is retried on
+    # the primary
+    async def fetch(self, pool, query):
+        sql, args, row = query
+        started = time.perf_counter()
+        try:
+            async with pool.acquire() as connection:
+                records = await connection.fetch(sql, *args, timeout=self.timeout)
+        except (OSError, asyncpg.PostgresConnectionError):
+            if pool is self.primary:
+                raise
+            return await self.fetch(self.primary, query)
+        return [row(*record) for record in records], sql, time.perf_counter() - started
+
+    # run the named queries concurrently, each on its own connection
+    async def fetch_all(self, queries, use_replica):
+        pool = self.pick(use_replica)
+        results = await asyncio.gather(*[self.fetch(pool, query) for query in queries.values()])
+        return dict(zip(queries, results))
+
+
+#----------------------------------------------------------------------------#
+# Handlers.
+#----------------------------------------------------------------------------#
+
+
+# async handlers by flask endpoint. A handler is given the view arguments of
+# the request and returns the queries it needs by name along with a function
+# rendering their rows, which may return None to leave the request to the
+# WSGI view, as for a missing venue whose page flashes a message
+handlers = {}
+
+
+def handles(endpoint):
+    def decorator(handler):
+        handlers[endpoint] = handler
+        return handler
+    return decorator
+
+
+# a venue or artist page and its shows, split into upcoming and past
+def page(model, fields, id, shows_query, template, name):
+    queries = {
+        "row": db.session.query(*[getattr(model, field) for field in fields]).filter(model.id == id),
+        "shows": shows_query(id)
+    }
+
+    def render(row, shows):
+        if not row:
+            return None
+        upcoming_shows, past_shows = split_shows(shows)
+        data = row[0]._asdict()
+        data.update({
+            "past_shows": past_shows,
+            "upcoming_shows": upcoming_shows,
+            "past_shows_count": len(past_shows),
+            "upcoming_shows_count": len(upcoming_shows)
+        })
+        return render_template(template, **{name: data})
+
+    return queries, render
+
+
+@handles('show_venue')
+def show_venue(venue_id):
+    return page(Venue, VENUE_FIELDS, venue_id, venue_shows_query, 'pages/show_venue.html', 'venue')
+
+
+@handles('show_artist')
+def show_artist(artist_id):
+    return page(Artist, ARTIST_FIELDS, artist_id, artist_shows_query, 'pages/show_artist.html', 'artist')
+
+
+# the api detail of a venue or artist, as detail() in app.py builds it
+def detail(model, fields, id, shows_query):
+    names = requested_fields(fields + COUNT_FIELDS + SHOWS_FIELDS)
+    columns = [getattr(model, name) for name in names if name in fields] or [model.id]
+    queries = {"row": db.session.query(*columns).filter(model.id == id)}
+    if any(name in COUNT_FIELDS + SHOWS_FIELDS for name in names):
+        queries["shows"] = shows_query(id)
+
+    def render(row, shows=None):
+        if not row:
+            return None
+        item = serialize(row[0], [name for name in names if name in fields])
+        if shows is not None:
+            upcoming_shows, past_shows = split_shows(shows)
+            shows = {
+                "past_shows": [serialize_show(show) for show in past_shows],
+                "upcoming_shows": [serialize_show(show) for show in upcoming_shows],
+                "past_shows_count": len(past_shows),
+                "upcoming_shows_count": len(upcoming_shows)
+            }
+            item.update({name: shows[name] for name in names if name in shows})
+        return {"data": item}
+
+    return queries, render
+
+
+@handles('api.api_venue')
+def api_venue(venue_id):
+    return detail(Venue, VENUE_FIELDS, venue_id, venue_shows_query)
+
+
+@handles('api.api_artist')
+def api_artist(artist_id):
+    return detail(Artist, ARTIST_FIELDS, artist_id, artist_shows_query)
+
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+
+# a flask request context for an http scope
+def request_context(scope):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+    return app.test_request_context(
+        path,
+        base_url='{}://{}:{}{}'.format(scope.get('scheme', 'http'), server[0], server[1], root_path),
+        query_string=scope['query_string'],
+        method=scope['method'],
+        headers=[(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']],
+        environ_base={'REMOTE_ADDR': client[0]})
+
+
+# the idents task_identity hands out
+task_idents = itertools.count()
+
+
+# run the block under an ident of the current asyncio task's own, so the
+# flask contexts it pushes and the database session it uses are its own too,
+# even across awaits, while other requests run on the loop's thread
+@contextlib.contextmanager
+def task_identity():
+    token = task_ident.set(('task', next(task_idents)))
+    try:
+        yield
+    finally:
+        task_ident.reset(token)
+
+
+# key flask's context stacks by the same ident as the database sessions;
+# werkzeug 1.0 keeps them per thread and has no other way to know of tasks.
+# Outside task_identity the ident is the thread's, as it was before
+def task_contexts():
+    _app_ctx_stack.__ident_func__ = scope_ident
+    _request_ctx_stack.__ident_func__ = scope_ident
+
+
+# the ASGI application: the async handlers above where they apply, the WSGI
+# app for everything else
+class Application(object):
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=app.config['ASGI_WSGI_THREADS'])
+        self.databases = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] == 'http' and self.databases is not None:
+            response = await self.serve(scope)
+            if response is not None:
+                return await self.send(scope, send, response)
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.databases is not None:
+                    await self.databases.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        config = self.app.config
+        if not config['ASYNC_VIEWS']:
+            return
+        if asyncpg is None:
+            logger.warning('serving every route through WSGI: the asyncpg package is not installed')
+            return
+        if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'postgresql':
+            logger.warning('serving every route through WSGI: asyncpg only speaks to postgres')
+            return
+
+        databases = Databases(config)
+        await databases.connect()
+        task_contexts()
+        self.databases = databases
+
+    # the response of an async handler, or None to pass the request on
+    async def serve(self, scope):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+
+        with task_identity(), self.app.app_context(), request_context(scope):
+            handler = handlers.get(request.endpoint)
+            if handler is None or request.routing_exception is not None:
+                return None
+
+            try:
+                self.app.try_trigger_before_first_request_functions()
+                self.app.preprocess_request()
+
+                # the same response cache and tags as the WSGI view
+                cache_tags = getattr(self.app.view_functions[request.endpoint], 'cache_tags', None)
+                entry = None
+                if cache_tags is not None and response_cache.cacheable():
+                    cached, entry = response_cache.lookup(
+                        cache_tags(**request.view_args) if callable(cache_tags) else cache_tags)
+                    if cached is not None:
+                        return self.app.process_response(cached)
+
+                queries, render = handler(**request.view_args)
+                queries = {name: compile_query(query) for name, query in queries.items()}
+                use_replica = not g.get('read_primary') and session.get('_primary_until', 0) < time.time()
+
+            # the WSGI view answers bad requests with its usual error
+            except HTTPException:
+                return None
+            except Exception:
+                logger.exception('async handler failed, passing the request to WSGI')
+                return None
+
+            try:
+                results = await self.databases.fetch_all(queries, use_replica)
+            except Exception:
+                logger.exception('async queries failed, passing the request to WSGI')
+                return None
+
+            try:
+                stats = instrumentation.stats()
+                if stats is not None:
+                    for rows, sql, duration in results.values():
+                        stats.record(sql, duration)
+
+                rv = render(**{name: rows for name, (rows, sql, duration) in results.items()})
+                if rv is None:
+                    return None
+
+                response = self.app.make_response(rv)
+                if entry is not None:
+                    response = response_cache.store(response, entry)
+                return self.app.process_response(response)
+            except Exception:
+                logger.exception('async handler failed, passing the request to WSGI')
+                return None
+
+    async def send(self, scope, send, response):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers]
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'' if scope['method'] == 'HEAD' else response.get_data()
+        })
+
+
+application = Application(app)
@@ -0,0 +1,123 @@
+import bisect
+import threading
+import time
+
+
+# substring lookups scan the postings of one of the query's character trigrams
+GRAM_SIZE = 3
+
+# the most postings a substring lookup scans, so a query made of common
+# trigrams costs no more than this however many names share them
+SCAN_LIMIT = 2000
+
+
+# fold names so lookups ignore case
+def fold(name):
+    return name.casefold()
+
+
+# every distinct trigram in a folded name
+def grams(folded):
+    return {folded[i:i + GRAM_SIZE] for i in range(len(folded) - GRAM_SIZE + 1)}
+
+
+# an in-memory index of (id, name) pairs answering prefix and substring
+# lookups without touching the database; each name is kept as a (folded name,
+# id, name) key, in a sorted array for prefix scans and in sorted trigram
+# postings to find substring matches
+#
+# writers replace a posting list instead of changing it, so a lookup scans the
+# list it picked after letting go of the lock, at worst seeing a name that was
+# just renamed or removed
+class NameIndex(object):
+
+    def __init__(self, scan_limit=SCAN_LIMIT):
+        self.scan_limit = scan_limit
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._keys = []
+        self._postings = {}
+        self._built = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    # replace the contents of the index with the given (id, name) rows
+    def build(self, rows):
+        entries = {id: (fold(name), id, name) for id, name in rows}
+        keys = sorted(entries.values())
+        postings = {}
+        for key in keys:
+            for gram in grams(key[0]):
+                postings.setdefault(gram, []).append(key)
+
+        with self._lock:
+            self._entries, self._keys, self._postings = entries, keys, postings
+            self._built = time.monotonic()
+
+    # whether the index was built more than max_age seconds ago; only the
+    # first caller to find it so is told, and is the one to rebuild it
+    def expired(self, max_age):
+        with self._lock:
+            if not max_age or self._built is None or time.monotonic() - self._built < max_age:
+                return False
+            self._built = time.monotonic()
+            return True
+
+    # add a name to the index, or rename an id that is already there
+    def add(self, id, name):
+        with self._lock:
+            self._discard(id)
+            key = (fold(name), id, name)
+            self._entries[id] = key
+            bisect.insort(self._keys, key)
+            for gram in grams(key[0]):
+                postings = list(self._postings.get(gram, ()))
+                bisect.insort(postings, key)
+                self._postings[gram] = postings
+
+    # drop an id from the index
+    def remove(self, id):
+        with self._lock:
+            self._discard(id)
+
+    def _discard(self, id):
+        key = self._entries.pop(id, None)
+        if key is None:
+            return
+
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        for gram in grams(key[0]):
+            postings = self._postings[gram]
+            if len(postings) > 1:
+                i = bisect.bisect_left(postings, key)
+                self._postings[gram] = postings[:i] + postings[i + 1:]
+            else:
+                del self._postings[gram]
+
+    # up to limit (id, name) pairs matching the query, names starting with
+    # the query first, then names containing it, each in name order
+    def search(self, query, limit=10):
+        folded = fold(query.strip())
+        if not folded or limit < 1:
+            return []
+
+        with self._lock:
+            # prefix matches are a contiguous run of the sorted keys
+            start = bisect.bisect_left(self._keys, (folded,))
+            matches = [key for key in self._keys[start:start + limit] if key[0].startswith(folded)]
+
+            # substring matches need a full trigram; the shortest posting list
+            # of the query's trigrams holds every name containing it
+            postings = []
+            if len(matches) < limit and len(folded) >= GRAM_SIZE:
+                postings = min((self._postings.get(gram, ()) for gram in grams(folded)), key=len)
+
+        # the postings are in name order, so the scan stops at the first limit found
+        for key in postings[:self.scan_limit]:
+            if folded in key[0] and not key[0].startswith(folded):
+                matches.append(key)
+                if len(matches) == limit:
+                    break
+
+        return [(id, name) for _, id, name in matches]
@@ -0,0 +1,532 @@
+# benchmark every read route of the app
+# against a synthetic dataset: first one request at a time through the
+# flask test client, then under concurrent load over http, reporting the
+# p50/p95/p99 latency and queries per request of each route and the peak rss,
+# and failing when a baseline file shows a regression
+#
+#   python bench.py --venues 10000 --artists 100000 --shows 1000000
+#   python bench.py --save-baseline      # record the current numbers
+#   python bench.py                      # compare against them
+#   python bench.py --micro              # only time the template filters
+#   python bench.py --serve asgi         # load asgi.py in a child process
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from seed import ADJECTIVES, NOUNS, PLACES, CatalogGenerator
+
+
+DEFAULT_DATABASE = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench.db')
+
+# the words searches and type-ahead lookups are made of
+WORDS = ADJECTIVES + NOUNS + PLACES
+
+# the query count reported by the app's Server-Timing header
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the routes of the app.')
+    parser.add_argument('--database', default=os.environ.get('BENCH_DATABASE_URL', DEFAULT_DATABASE),
+                        help='database to seed and serve from (default: a sqlite file in the temp dir)')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the dataset and the requests')
+    parser.add_argument('--reseed', action='store_true',
+                        help='drop and recreate the tables when they do not hold the requested dataset')
+    parser.add_argument('--requests', type=int, default=50, help='test client requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per route first')
+    parser.add_argument('--concurrency', type=int, default=8, help='load generator threads, 0 to skip the load run')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of the load run')
+    parser.add_argument('--url', help='load a server already running here instead of an in-process one')
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'],
+                        help='load the WSGI app or asgi.py served by a child process, reporting its '
+                             'requests per cpu second, the throughput of one core')
+    parser.add_argument('--cache', action='store_true', help='leave the response cache on')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative change of latency, throughput and peak rss from the baseline')
+    parser.add_argument('--slack-ms', type=float, default=2.0,
+                        help='allowed absolute slowdown, so tiny latencies do not flap')
+    parser.add_argument('--output', help='also write the results as json here')
+    parser.add_argument('--micro', action='store_true', help='only run the micro-benchmarks of the template filters')
+    parser.add_argument('--seed-only', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--serve-port', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+#----------------------------------------------------------------------------#
+# Dataset.
+#----------------------------------------------------------------------------#
+
+
+# the app reads its config from the environment on import
+def load_app(args):
+    os.environ['DATABASE_URL'] = args.database
+    os.environ.setdefault('FYYUR_ENV', 'production')
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ.setdefault('CACHE_TYPE', 'simple' if args.cache else 'null')
+    os.environ.setdefault('SQL_DEBUG_FOOTER', 'false')
+    os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'fyyur_bench.log'))
+    import app
+    app.app.config['WTF_CSRF_ENABLED'] = False
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore', module='app')
+    return app
+
+
+# the row counts the tables hold now
+def counts(fyyur):
+    return {
+        "venues": fyyur.Venue.query.count(),
+        "artists": fyyur.Artist.query.count(),
+        "shows": fyyur.Show.query.count()
+    }
+
+
+# make sure the database holds the requested dataset, seeding it if needed
+def prepare_dataset(fyyur, args):
+    db = fyyur.db
+    wanted = {"venues": args.venues, "artists": args.artists, "shows": args.shows}
+
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        db.session.commit()
+    db.create_all()
+
+    found = counts(fyyur)
+    if found == wanted:
+        return
+    if any(found.values()):
+        if not args.reseed:
+            sys.exit('the database holds {} rather than {}; pass --reseed to replace it'.format(found, wanted))
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+    print('seeding {venues} venues, {artists} artists and {shows} shows'.format(**wanted), file=sys.stderr)
+    started = time.time()
+    fyyur.seed_catalog(args.venues, args.artists, args.shows, args.seed)
+    print('seeded in {:.0f}s'.format(time.time() - started), file=sys.stderr)
+
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+
+# a request to make against the app; the path and the data are filled in
+# with values drawn afresh for every request. Only routes that leave the
+# dataset as they found it are benchmarked, since the edit handlers set the
+# seeking flags and links whatever the form held
+class Target(object):
+
+    def __init__(self, name, method, path, data=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+
+    def build(self, rng, ids):
+        values = {name: pick(rng) for name, pick in ids.items()}
+        values.update({
+            "term": rng.choice(WORDS).lower(),
+            "prefix": urllib.parse.quote(rng.choice(WORDS)[:rng.randint(1, 4)]),
+            "letter": rng.choice(WORDS)[0]
+        })
+        data = self.data(values) if callable(self.data) else self.data
+        return self.path.format(**values), data
+
+
+def targets(fyyur):
+    search = lambda values: {"search_term": values["term"]}
+
+    routes = [
+        Target('index', 'GET', '/'),
+        Target('venues', 'GET', '/venues'),
+        Target('show_venue', 'GET', '/venues/{venue}'),
+        Target('search_venues', 'POST', '/venues/search', search),
+        Target('autocomplete_venues', 'GET', '/venues/autocomplete?q={prefix}'),
+        Target('create_venue_form', 'GET', '/venues/create'),
+        Target('edit_venue', 'GET', '/venues/{venue}/edit'),
+        Target('artists', 'GET', '/artists'),
+        Target('artists_letter', 'GET', '/artists?letter={letter}'),
+        Target('show_artist', 'GET', '/artists/{artist}'),
+        Target('search_artists', 'POST', '/artists/search', search),
+        Target('autocomplete_artists', 'GET', '/artists/autocomplete?q={prefix}'),
+        Target('create_artist_form', 'GET', '/artists/create'),
+        Target('edit_artist', 'GET', '/artists/{artist}/edit'),
+        Target('shows', 'GET', '/shows'),
+        Target('create_shows', 'GET', '/shows/create'),
+        Target('export_download', 'GET', '/export/venues.csv'),
+        Target('pool_status', 'GET', '/debug/pool'),
+        Target('metrics', 'GET', '/metrics'),
+        Target('api.api_venues', 'GET', '/api/v1/venues'),
+        Target('api.api_venue', 'GET', '/api/v1/venues/{venue}'),
+        Target('api.api_artists', 'GET', '/api/v1/artists'),
+        Target('api.api_artist', 'GET', '/api/v1/artists/{artist}'),
+        Target('api.api_shows', 'GET', '/api/v1/shows'),
+        Target('api.api_show', 'GET', '/api/v1/shows/{show}')
+    ]
+
+    # artists_letter is the artists route with ?letter=
+    return [target for target in routes if target.name.split('_letter')[0] in fyyur.app.view_functions]
+
+
+# a picker of random existing ids for venues, artists and shows
+def id_pickers(fyyur):
+    pickers = {}
+    for name, model in (('venue', fyyur.Venue), ('artist', fyyur.Artist), ('show', fyyur.Show)):
+        low, high = fyyur.db.session.query(fyyur.db.func.min(model.id), fyyur.db.func.max(model.id)).one()
+        pickers[name] = lambda rng, low=low or 0, high=high or 0: rng.randint(low, high)
+    fyyur.db.session.remove()
+    return pickers
+
+
+# the routes of the app no target exercises
+def uncovered(fyyur, names):
+    endpoints = {rule.endpoint for rule in fyyur.app.url_map.iter_rules()} - {'static'}
+    return sorted(endpoints - set(names))
+
+
+#----------------------------------------------------------------------------#
+# Runs.
+#----------------------------------------------------------------------------#
+
+
+# the value below which the given fraction of the sorted samples fall
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+# p50/p95/p99 latency in ms, median queries and failures of one route
+def summarize(samples):
+    latencies = sorted(latency for latency, _, _ in samples)
+    queries = sorted(count for _, count, _ in samples if count is not None)
+    return {
+        "requests": len(samples),
+        "failed": sum(1 for _, _, ok in samples if not ok),
+        "p50": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries": percentile(queries, 0.5)
+    }
+
+
+def query_count(header):
+    match = QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+# one request at a time through the test client, after a warmup
+def run_sequential(fyyur, targets, ids, args):
+    rng = random.Random(args.seed)
+    client = fyyur.app.test_client()
+    results = {}
+
+    for target in targets:
+        samples = []
+        for i in range(args.warmup + args.requests):
+            path, data = target.build(rng, ids)
+            started = time.perf_counter()
+            response = client.open(path, method=target.method, data=data)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            if i >= args.warmup:
+                samples.append((elapsed, query_count(response.headers.get('Server-Timing')), response.status_code < 400))
+        results[target.name] = summarize(samples)
+
+    return results
+
+
+# serve the app from a threaded http server in this process
+def start_server(fyyur):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, fyyur.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+# serve the app from a child process on a free port, as the same script run
+# with --serve-port, so the cpu time it takes can be measured on its own
+def spawn_server(args):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-port', str(port)] + sys.argv[1:])
+    url = 'http://127.0.0.1:{}'.format(port)
+    deadline = time.time() + 60
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return child, url
+        except OSError:
+            if child.poll() is not None or time.time() > deadline:
+                child.kill()
+                sys.exit('the {} server did not start'.format(args.serve))
+            time.sleep(0.1)
+
+
+# the cpu seconds a child server used over its lifetime, once it has stopped
+def stop_server(child):
+    child.terminate()
+    _, _, usage = os.wait4(child.pid, 0)
+    child.returncode = 0
+    return usage.ru_utime + usage.ru_stime
+
+
+# the body of the child process spawn_server starts: one process, as one
+# gunicorn or uvicorn worker would be
+def serve(fyyur, args):
+    if args.serve == 'asgi':
+        import asgi
+        import uvicorn
+        uvicorn.run(asgi.application, host='127.0.0.1', port=args.serve_port, log_level='warning')
+    else:
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', args.serve_port, fyyur.app, threaded=True).serve_forever()
+
+
+# redirects after a form submission are timed on their own, not followed
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+# concurrency threads making requests to every route in turn for duration seconds
+def run_load(targets, ids, url, args):
+    samples = {target.name: [] for target in targets}
+    opener = urllib.request.build_opener(NoRedirect)
+    deadline = time.perf_counter() + args.duration
+
+    def worker(number):
+        rng = random.Random(args.seed * 1000 + number)
+        for i in range(sys.maxsize):
+            if time.perf_counter() >= deadline:
+                return
+            target = targets[(number + i) % len(targets)]
+            path, data = target.build(rng, ids)
+            body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+            request = urllib.request.Request(url + path, data=body, method=target.method)
+            started = time.perf_counter()
+            try:
+                with opener.open(request) as response:
+                    response.read()
+                    status, header = response.status, response.headers.get('Server-Timing')
+            except urllib.error.HTTPError as error:
+                status, header = error.code, error.headers.get('Server-Timing')
+            samples[target.name].append((time.perf_counter() - started, query_count(header), status < 400))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(route) for name, route in samples.items() if route}
+    results["all"] = summarize([sample for route in samples.values() for sample in route])
+    return results, round(results["all"]["requests"] / elapsed, 1)
+
+
+# peak resident set size of this process in megabytes
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+#----------------------------------------------------------------------------#
+# Micro-benchmarks.
+#----------------------------------------------------------------------------#
+
+
+# the datetime filter as it used to be, for comparison: the show's start time
+# was turned into a string, parsed back and formatted with a fresh pattern
+def parse_and_format(value, format='medium'):
+    import babel.dates
+    import dateutil.parser
+    date = dateutil.parser.parse(str(value))
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+# microseconds per call of format over the values, best of a few rounds
+def time_calls(format, values, rounds=5, before_round=None):
+    best = None
+    for _ in range(rounds):
+        if before_round is not None:
+            before_round()
+        started = time.perf_counter()
+        for value in values:
+            format(value, 'full')
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(values) * 10 ** 6
+
+
+# time the datetime filter over the start times of a busy venue page
+def run_micro(fyyur, args):
+    generator = CatalogGenerator(args.seed)
+    values = [generator.start_time(730, 180) for _ in range(500)]
+    format = fyyur.format_datetime
+    assert [format(value, 'full') for value in values] == [parse_and_format(value, 'full') for value in values]
+
+    results = {
+        "parse and format": time_calls(parse_and_format, values),
+        "filter, cold cache": time_calls(format, values, before_round=format.cache_clear),
+        "filter, warm cache": time_calls(format, values)
+    }
+
+    print('\ndatetime filter over {} show start times'.format(len(values)))
+    for name, micros in results.items():
+        print('{:<20} {:>9.2f} us/call {:>8.1f}x'.format(name, micros, results["parse and format"] / micros))
+    return results
+
+
+#----------------------------------------------------------------------------#
+# Report.
+#----------------------------------------------------------------------------#
+
+
+def print_table(title, results):
+    print('\n' + title)
+    print('{:<28} {:>8} {:>7} {:>9} {:>9} {:>9} {:>8}'.format('route', 'requests', 'failed', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'))
+    for name, row in results.items():
+        print('{:<28} {requests:>8} {failed:>7} {p50:>9} {p95:>9} {p99:>9} {queries!s:>8}'.format(name, **row))
+
+
+# the regressions of the results against the baseline, as messages; a few
+# dozen requests give too unsteady a p95 for one route, so each route is held
+# to its median one request at a time, and under load only the p95 over all
+# routes is checked
+def regressions(results, baseline, args):
+    messages = []
+    for phase in ('sequential', 'load'):
+        for name, row in results.get(phase, {}).items():
+            base = baseline.get(phase, {}).get(name)
+            if base is None:
+                continue
+            statistic = 'p95' if name == 'all' else 'p50'
+            timed = phase == 'sequential' or name == 'all'
+            if timed and row[statistic] > base[statistic] * (1 + args.tolerance) + args.slack_ms:
+                messages.append('{} {}: {} {} ms, baseline {} ms'.format(phase, name, statistic, row[statistic], base[statistic]))
+            if row["queries"] is not None and base["queries"] is not None and row["queries"] > base["queries"]:
+                messages.append('{} {}: {} queries, baseline {}'.format(phase, name, row["queries"], base["queries"]))
+            if row["failed"] > base["failed"]:
+                messages.append('{} {}: {} failed, baseline {}'.format(phase, name, row["failed"], base["failed"]))
+
+    if baseline.get("throughput") and results.get("throughput", 0) < baseline["throughput"] * (1 - args.tolerance):
+        messages.append('throughput {} requests/s, baseline {}'.format(results.get("throughput"), baseline["throughput"]))
+    if baseline.get("server") == results.get("server") and baseline.get("requests_per_cpu_second") and \
+            results.get("requests_per_cpu_second", 0) < baseline["requests_per_cpu_second"] * (1 - args.tolerance):
+        messages.append('{} requests per cpu second, baseline {}'.format(
+            results.get("requests_per_cpu_second"), baseline["requests_per_cpu_second"]))
+    if baseline.get("peak_rss_mb") and results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + args.tolerance):
+        messages.append('peak rss {} MB, baseline {} MB'.format(results["peak_rss_mb"], baseline["peak_rss_mb"]))
+    return messages
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fyyur = load_app(args)
+
+    with fyyur.app.app_context():
+
+        if args.micro:
+            run_micro(fyyur, args)
+            return
+
+        # seed in a child process so its memory does not count in the peak rss
+        if args.seed_only:
+            prepare_dataset(fyyur, args)
+            return
+        if args.serve_port:
+            serve(fyyur, args)
+            return
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--seed-only'] + sys.argv[1:], check=True)
+
+        routes = targets(fyyur)
+        ids = id_pickers(fyyur)
+        dataset = counts(fyyur)
+        fyyur.db.session.remove()
+
+        results = {"dataset": dataset, "database": fyyur.db.engine.dialect.name, "cache": args.cache}
+        results["sequential"] = run_sequential(fyyur, routes, ids, args)
+        print_table('test client, one request at a time', results["sequential"])
+
+        if args.concurrency:
+            server = child = None
+            url = args.url
+            if url is None and args.serve:
+                child, url = spawn_server(args)
+            elif url is None:
+                server, url = start_server(fyyur)
+            results["load"], results["throughput"] = run_load(routes, ids, url, args)
+            if server is not None:
+                server.shutdown()
+            print_table('http, {} concurrent clients: {} requests/s'.format(args.concurrency, results["throughput"]),
+                        results["load"])
+
+            if child is not None:
+                results["server"] = args.serve
+                cpu_seconds = stop_server(child)
+                results["requests_per_cpu_second"] = round(results["load"]["all"]["requests"] / cpu_seconds, 1)
+                print('\n{} server: {} requests per cpu second'.format(args.serve, results["requests_per_cpu_second"]))
+
+        results["peak_rss_mb"] = peak_rss()
+        print('\npeak rss {} MB'.format(results["peak_rss_mb"]))
+        missing = uncovered(fyyur, [target.name for target in routes])
+        if missing:
+            print('not benchmarked, as they would change the dataset: ' + ', '.join(missing))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as output:
+            json.dump(results, output, indent=2)
+        print('saved the baseline to ' + args.baseline)
+        return
+
+    if not os.path.exists(args.baseline):
+        print('no baseline at {}; run with --save-baseline to record one'.format(args.baseline))
+        return
+
+    with open(args.baseline) as baseline:
+        baseline = json.load(baseline)
+    if baseline.get("dataset") != results["dataset"]:
+        sys.exit('the baseline was recorded on {}, not {}'.format(baseline.get("dataset"), results["dataset"]))
+
+    failures = regressions(results, baseline, args)
+    for message in failures:
+        print('REGRESSION ' + message)
+    if failures:
+        sys.exit(1)
+    print('no regressions against ' + args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import collections
+import functools
+import hashlib
+import math
+import pickle
+import threading
+import time
+from datetime import datetime
+from flask import g, request, session, make_response, Response
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# an in-process cache evicting the least recently used entry once full,
+# with entries expiring after their timeout
+class LRUCache(object):
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    # store a value, forever when timeout is None
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# a cache shared by every worker, stored in redis
+class RedisCache(object):
+
+    def __init__(self, url, prefix='fyyur:'):
+        if redis is None:
+            raise RuntimeError('CACHE_TYPE redis needs the redis package installed')
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout)
+
+    def get_many(self, keys):
+        values = self._client.mget([self.prefix + key for key in keys])
+        return [pickle.loads(value) if value is not None else None for value in values]
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+# the cache backend named by CACHE_TYPE, or None when caching is off
+def create_backend(config):
+    cache_type = config.get('CACHE_TYPE', 'simple')
+    if cache_type == 'simple':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024))
+    if cache_type == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'])
+    if cache_type == 'null':
+        return None
+    raise ValueError('unknown CACHE_TYPE ' + cache_type)
+
+
+# caches rendered GET responses by path and query string. Every cached view
+# depends on a list of tags such as 'venue:5', and each tag carries a version
+# that is part of the cache key, so invalidating a tag replaces its version
+# and every response that depended on it is simply never looked up again.
+# The same versions give each page an ETag and Last-Modified, so conditional
+# requests are answered with a 304 before the view runs any query.
+#
+# A page rendered just after one of its tags was invalidated would be cached
+# under the new version, but could be read from a replica that has not seen
+# the write yet; for replica_lag seconds after an invalidation lookup()
+# leaves g.read_primary set on a miss, so the page is read from the primary
+class ResponseCache(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 60
+        self.replica_lag = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+        if app.config.get('SQLALCHEMY_REPLICA_URIS'):
+            self.replica_lag = app.config.get('REPLICA_STICKY_SECONDS', 10)
+        app.extensions['response_cache'] = self
+
+        # template fragments are kept in each process, whatever the backend
+        self.fragments = LRUCache(app.config.get('CACHE_FRAGMENT_ENTRIES', 4096)) if self.backend is not None else None
+        self.fragment_timeout = app.config.get('CACHE_FRAGMENT_TIMEOUT', 3600)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    # the current version of each tag; a tag seen for the first time starts
+    # at the current time, so a version lost to eviction never comes back
+    def versions(self, tags):
+        keys = ['tag:' + tag for tag in tags]
+        versions = self.backend.get_many(keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                versions[i] = time.time()
+                self.backend.set(keys[i], versions[i])
+        return versions
+
+    # the ETag and Last-Modified of a page built on the given tag versions; the
+    # cache timeout, if any, also bounds them, since upcoming shows become past
+    # shows without any write
+    def validators(self, versions):
+        period = time.time() // self.timeout * self.timeout if self.timeout else 0
+        token = repr((request.full_path, versions, period)).encode()
+        last_modified = max([math.floor(version) + 1 for version in versions] + [period])
+        return hashlib.sha1(token).hexdigest(), datetime.utcfromtimestamp(last_modified)
+
+    # drop every cached response depending on any of the tags; a new version
+    # always moves to a later second so Last-Modified changes with it
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        keys = ['tag:' + tag for tag in tags]
+        for key, version in zip(keys, self.backend.get_many(keys)):
+            next_second = math.floor(version) + 1 if version is not None else 0
+            self.backend.set(key, max(time.time(), next_second))
+
+    # whether the current request may be answered from the cache; pending
+    # flash messages are rendered into the page, so those are not
+    def cacheable(self):
+        return self.backend is not None and request.method == 'GET' and not session.get('_flashes')
+
+    # the cached or not modified response to the current request under the
+    # given tags, else None and the entry store() keeps the rendered page
+    # under; the outcome is left in g.cache_result for the metrics
+    def lookup(self, tags):
+        versions = self.versions(tags)
+        etag, last_modified = self.validators(versions)
+
+        # answer If-None-Match / If-Modified-Since without rendering
+        validated = Response()
+        validated.set_etag(etag)
+        validated.last_modified = last_modified
+        validated.make_conditional(request)
+        if validated.status_code == 304:
+            g.cache_result = 'not_modified'
+            return validated, None
+
+        key = 'view:{}:{}'.format(request.full_path, versions)
+        hit = self.backend.get(key)
+        if hit is not None:
+            g.cache_result = 'hit'
+            return self.revalidated(make_response(*hit), etag, last_modified), None
+
+        g.cache_result = 'miss'
+        if max(versions, default=0) > time.time() - self.replica_lag:
+            g.read_primary = True
+        return None, (key, etag, last_modified)
+
+    # keep a freshly rendered response under the entry lookup() gave
+    def store(self, response, entry):
+        key, etag, last_modified = entry
+
+        # only keep plain successful pages that did not touch the session
+        if response.status_code != 200 or response.direct_passthrough or session.modified:
+            return response
+
+        headers = [(name, value) for name, value in response.headers if name != 'Set-Cookie']
+        self.backend.set(key, (response.get_data(), response.status_code, headers), self.timeout or None)
+        return self.revalidated(response, etag, last_modified)
+
+    # browsers and proxies may keep the page but must revalidate it
+    def revalidated(self, response, etag, last_modified):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    # cache a view under the tags returned by tags(**view_args), or a list
+    def cached(self, tags):
+        def decorator(view):
+
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.cacheable():
+                    return view(**kwargs)
+
+                response, entry = self.lookup(tags(**kwargs) if callable(tags) else tags)
+                if response is not None:
+                    return response
+                return self.store(make_response(view(**kwargs)), entry)
+
+            # for other entry points serving the same route, such as asgi.py
+            wrapper.cache_tags = tags
+            return wrapper
+        return decorator
+
+
+# {% cache key, ... %}...{% endcache %} renders its body once per template
+# and distinct key values, and reuses the output from then on; keys made of
+# every value the body shows get a new fragment whenever any of them changes.
+# A body that shows more than its key can name its tags instead, as in
+# {% cache venue.id, tags=['venue:' ~ venue.id] %}, and is rendered again
+# once any of them is invalidated
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name)]
+        tags = nodes.List([])
+
+        while parser.stream.current.type != 'block_end':
+            if len(key) > 1 or tags.items:
+                parser.stream.expect('comma')
+            if parser.stream.current.test('name:tags') and parser.stream.look().test('assign'):
+                parser.stream.skip(2)
+                tags = parser.parse_expression()
+            else:
+                key.append(parser.parse_expression())
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render', [nodes.List(key), tags])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, tags, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or cache.fragments is None:
+            return caller()
+
+        versions = cache.versions(tags) if tags else []
+        fragment_key = repr((key, versions))
+        fragment = cache.fragments.get(fragment_key)
+        if fragment is None:
+            fragment = Markup(caller())
+            cache.fragments.set(fragment_key, fragment, cache.fragment_timeout)
+        return fragment
@@ -1,13 +1,145 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+# Settings profile: 'development' runs with debug mode and the debug
+# tooling, 'production' (what wsgi.py and gunicorn.conf.py default to)
+# without them; each setting below can still be overridden on its own
+ENV = os.environ.get('FYYUR_ENV') or os.environ.get('FLASK_ENV', 'development')
+PRODUCTION = ENV == 'production'
+
+# Sign sessions with the same key in every worker and across restarts; only
+# development falls back to a key of its own, which every restart changes
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    if PRODUCTION:
+        raise RuntimeError('set SECRET_KEY to run with the production settings')
+    SECRET_KEY = os.urandom(32)
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', str(not PRODUCTION)).lower() == 'true'
+
+# Flask-Moment and the moment.js script every page loads, unused by the
+# pages themselves
+MOMENT_ENABLED = os.environ.get('MOMENT_ENABLED', str(not PRODUCTION)).lower() == 'true'
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://jsalter@localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replicas for the read-only pages, comma separated, and how long after
+# a write a browser keeps reading from the primary to see its own changes,
+# as do pages rendered for the response cache
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+# Connection pool of each worker process (postgres only)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+# Cancel statements running longer than this many milliseconds, 0 for never
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+
+# Connecting through PgBouncer in transaction mode: no session level state,
+# so the statement timeout is set per transaction instead of per connection
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'false').lower() == 'true'
+
+# Outside debug mode the internal endpoints (/metrics, /debug/pool, /import
+# and /export) answer requests sending "Authorization: Bearer INTERNAL_TOKEN",
+# or coming straight from one of the INTERNAL_ADDRESSES (comma separated).
+# A request that passed through a reverse proxy, which says so in
+# Forwarded or X-Forwarded-For, never counts as coming from the proxy itself
+INTERNAL_TOKEN = os.environ.get('INTERNAL_TOKEN', '')
+INTERNAL_ADDRESSES = [address for address in os.environ.get('INTERNAL_ADDRESSES', '').split(',') if address]
+
+# Pagination for the listing pages, overridable per request with ?per_page=
+SHOWS_PER_PAGE = int(os.environ.get('SHOWS_PER_PAGE', 30))
+ARTISTS_PER_PAGE = int(os.environ.get('ARTISTS_PER_PAGE', 50))
+API_PER_PAGE = int(os.environ.get('API_PER_PAGE', 50))
+MAX_PER_PAGE = int(os.environ.get('MAX_PER_PAGE', 100))
+
+# Let venue and artist searches also match "City, ST", a state code or a genre
+SEARCH_EXTENDED = os.environ.get('SEARCH_EXTENDED', 'true').lower() == 'true'
+
+# Largest number of names a type-ahead lookup returns
+AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', 20))
+
+# Each worker keeps its own type-ahead name index and only sees the names its
+# own requests add, rename or delete; names changed by other workers or by the
+# flask commands show up when it rebuilds the index this often (0 never does)
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.environ.get('AUTOCOMPLETE_REFRESH_SECONDS', 300))
+
+# Worker processes serving the app; gunicorn.conf.py and uvicorn both start
+# as many as WEB_CONCURRENCY asks for
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Response cache for the read-only pages: 'simple' (in-process LRU), 'redis'
+# (shared by every worker, needs CACHE_REDIS_URL) or 'null' to turn it off.
+# A 'simple' cache only hears of the writes its own process makes, so it is
+# refused for more than one worker, and pages changed by the flask commands
+# stay cached until CACHE_DEFAULT_TIMEOUT (seconds, 0 for no timeout)
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 60))
+if CACHE_TYPE == 'simple' and WEB_CONCURRENCY > 1:
+    raise RuntimeError('CACHE_TYPE simple cannot be shared by {} workers; use redis or null'.format(WEB_CONCURRENCY))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+# Rendered {% cache %} template fragments each worker keeps, and for how long
+CACHE_FRAGMENT_ENTRIES = int(os.environ.get('CACHE_FRAGMENT_ENTRIES', 4096))
+CACHE_FRAGMENT_TIMEOUT = int(os.environ.get('CACHE_FRAGMENT_TIMEOUT', 3600))
+
+# Rows per executemany batch (and per commit) in bulk imports
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+
+# Rows fetched per round trip from the server side cursor of an export
+EXPORT_YIELD_PER = int(os.environ.get('EXPORT_YIELD_PER', 1000))
+
+# Log file for errors and slow queries outside debug mode, one json object per
+# line; empty for none
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+
+# Log statements taking longer than SLOW_QUERY_MS, and requests whose
+# statements took longer than SLOW_REQUEST_DB_MS in total along with their
+# SQL_SLOWEST_KEPT slowest statements
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_REQUEST_DB_MS = int(os.environ.get('SLOW_REQUEST_DB_MS', 500))
+SQL_SLOWEST_KEPT = int(os.environ.get('SQL_SLOWEST_KEPT', 5))
+
+# Show the query count, database time and slowest statements under each page
+SQL_DEBUG_FOOTER = os.environ.get('SQL_DEBUG_FOOTER', 'false').lower() == 'true'
+
+# Serve prometheus metrics at /metrics. Under gunicorn, set the
+# prometheus_multiproc_dir environment variable to an empty directory so the
+# metrics of every worker are collected there and added up
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Formatted datetimes the datetime template filter remembers
+DATETIME_FILTER_CACHE_SIZE = int(os.environ.get('DATETIME_FILTER_CACHE_SIZE', 4096))
+
+# Templates precompiled by `flask compile-templates`, rebuilt on every deploy;
+# empty to compile them from source
+TEMPLATE_BUNDLE = os.environ.get('TEMPLATE_BUNDLE', '')
+
+# Load every template at startup instead of on first use
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', 'true').lower() == 'true'
+
+# Months of monthly Shows partitions `flask shows-partitions` keeps ahead of
+# the current month, on postgres
+SHOWS_PARTITION_MONTHS_AHEAD = int(os.environ.get('SHOWS_PARTITION_MONTHS_AHEAD', 12))
 
+# Age in months at which `flask archive-shows` moves a Shows partition to
+# SHOWS_ARCHIVE_TABLESPACE, a tablespace on cheaper storage
+SHOWS_ARCHIVE_AFTER_MONTHS = int(os.environ.get('SHOWS_ARCHIVE_AFTER_MONTHS', 24))
+SHOWS_ARCHIVE_TABLESPACE = os.environ.get('SHOWS_ARCHIVE_TABLESPACE', '')
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://jsalter@localhost:5432/fyyur'
+# Under asgi.py, serve the venue and artist pages from async handlers on
+# asyncpg; off, or without asyncpg, every request goes to the WSGI app, which
+# runs on ASGI_WSGI_THREADS threads per worker
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'true').lower() == 'true'
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
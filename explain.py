@@ -0,0 +1,37 @@
+import re
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+# a plan line that reads a whole table rather than going through an index,
+# as printed by postgres (Seq Scan on "Shows") or sqlite (SCAN Shows)
+SEQUENTIAL_SCAN = re.compile(r'(?:Seq Scan on|SCAN(?: TABLE)?) "?(\w+)"?(?!.*\bUSING\b)')
+
+
+# an EXPLAIN of any select statement
+class Explain(Executable, ClauseElement):
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def compile_explain(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, 'sqlite')
+def compile_explain_sqlite(element, compiler, **kw):
+    return 'EXPLAIN QUERY PLAN ' + compiler.process(element.statement, **kw)
+
+
+# the plan of a query as lines of text; postgres returns one line per row,
+# sqlite returns (id, parent, notused, detail) rows
+def query_plan(session, query):
+    return [row[-1] for row in session.execute(Explain(query.statement))]
+
+
+# the plan lines that sequentially scan any of the given tables
+def sequential_scans(plan, tables):
+    return [line for line in plan
+            if any(match.group(1) in tables for match in SEQUENTIAL_SCAN.finditer(line))]
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from datetime import datetime
+from importer import LIST_SEPARATOR
+
+
+# rows are written out in chunks of this many, so a stream yields reasonably
+# sized pieces instead of one tiny string per row
+CHUNK_ROWS = 500
+
+
+# a value as it is written to a csv cell; lists use the same separator the
+# importer splits on and booleans the spelling it reads, so an export can be
+# imported again
+def csv_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return value
+
+
+# a value as it is written to a json line
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# stream row tuples as chunks of csv or jsonl text with the given column names
+def export_lines(rows, names, format):
+    if format not in ('csv', 'jsonl'):
+        raise ValueError('unknown export format ' + format)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == 'csv':
+        writer.writerow(names)
+
+    for count, row in enumerate(rows, 1):
+        if format == 'csv':
+            writer.writerow([csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps({name: json_value(value) for name, value in zip(names, row)}) + '\n')
+
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
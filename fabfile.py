@@ -13,6 +13,13 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(baseline="bench_baseline.json"):
+    with settings(warn_only=True):
+        result = local("python bench.py --baseline {}".format(baseline))
+    if result.failed:
+        abort("Benchmark regressed against {}.".format(baseline))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,86 @@
+# gunicorn settings for production, read from the working directory by
+# gunicorn 20 (`gunicorn -c gunicorn.conf.py wsgi:app` on older ones). Every
+# number can be overridden from the environment.
+#
+# The app is loaded once in the master and then forked, so the templates,
+# compiled code and caches filled at import time are shared copy-on-write by
+# every worker. Since the master keeps that app, send HUP to recycle the
+# workers gracefully without loading new code; to deploy new code without
+# dropping requests send USR2, which starts a new master next to the old one,
+# then WINCH and QUIT to the old master once the new workers are up.
+
+import gc
+import glob
+import multiprocessing
+import os
+
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+
+# the cores this process may run on, which in a container may be fewer than
+# the machine has
+def cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:{}'.format(os.environ.get('PORT', 8000)))
+
+# pages spend much of their time waiting on postgres, so each worker runs a
+# few threads: 2 * cores + 1 processes keep every core busy, and the threads
+# overlap the waits without holding more connections than DB_POOL_SIZE +
+# DB_MAX_OVERFLOW allow each worker. The app is told the number through
+# WEB_CONCURRENCY too, and refuses settings that only work in one process
+os.environ.setdefault('WEB_CONCURRENCY', str(cores() * 2 + 1))
+workers = int(os.environ['WEB_CONCURRENCY'])
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+preload_app = True
+
+# recycle each worker after a while so slow leaks and fragmentation do not
+# build up, staggered so the workers do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+
+
+# the metrics files of a previous run would be added to this one's
+def on_starting(server):
+    from metrics import multiprocess_dir
+    directory = multiprocess_dir()
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+# the preloaded app is in memory now; move it out of the garbage collector's
+# reach, so collections in the workers do not write to, and so copy, the
+# pages every worker shares
+def when_ready(server):
+    gc.freeze()
+
+
+# connections opened while loading the app must not be shared by the workers
+# forked from it, so the master drops its pools before every fork
+def pre_fork(server, worker):
+    from app import db, replicas
+    db.engine.dispose()
+    for engine in replicas.engines:
+        engine.dispose()
+
+
+# a worker's live metrics stop counting once it is gone
+def child_exit(server, worker):
+    from metrics import multiprocess_dir, prometheus_client
+    if multiprocess_dir() and prometheus_client is not None:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
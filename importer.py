@@ -0,0 +1,181 @@
+import csv
+import itertools
+import json
+from sqlalchemy.exc import StatementError
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField, SelectMultipleField
+from wtforms.validators import DataRequired
+
+
+# CSV cells holding several values, such as genres, separate them with this
+LIST_SEPARATOR = ';'
+
+# the spellings of a boolean cell, compared lowercased; anything else is an
+# error rather than true, as a form would read it
+TRUE_VALUES = ('true', 't', 'yes', 'y', '1', 'on')
+FALSE_VALUES = ('false', 'f', 'no', 'n', '0', 'off')
+
+
+# the outcome of one import: how many rows went in and why the others did not
+class ImportReport(object):
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "inserted": self.inserted,
+            "failed": len(self.errors),
+            "errors": [{"line": line, "error": message} for line, message in sorted(self.errors)]
+        }
+
+
+# stream (line, row, error) from csv or jsonl text one row at a time, so an
+# input of any size never has to fit in memory
+def read_rows(stream, format):
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'more cells than there are columns'
+            else:
+                yield reader.line_num, row, None
+        return
+
+    if format != 'jsonl':
+        raise ValueError('unknown import format ' + format)
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            yield line, None, 'not valid json: {}'.format(error)
+            continue
+        if not isinstance(row, dict):
+            yield line, None, 'expected a json object'
+            continue
+        yield line, row, None
+
+
+# the row as form data; lists from jsonl and separated csv cells of the
+# multiple choice fields both become repeated keys, which is how fields like
+# genres expect them, and empty cells are left out as if never filled in
+def form_data(row, multiple):
+    data = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            values = value
+        elif isinstance(value, str) and key in multiple:
+            values = [part.strip() for part in value.split(LIST_SEPARATOR)]
+        else:
+            values = [value]
+        for value in values:
+            if value is not None and value != '':
+                data.add(key, value if isinstance(value, str) else str(value))
+    return data
+
+
+# the names of a form's fields of the given class
+def fields_of(form_class, field_class):
+    return {name for name in dir(form_class)
+            if getattr(getattr(form_class, name), 'field_class', None) is field_class}
+
+
+# the row with its boolean cells spelled the way a BooleanField reads them,
+# and the name of the first cell that is not a boolean
+def parse_booleans(row, booleans):
+    row = dict(row)
+    for name in booleans:
+        value = row.get(name)
+        if value is None or value == '':
+            continue
+        value = str(value).strip().lower()
+        if value in TRUE_VALUES:
+            row[name] = 'true'
+        elif value in FALSE_VALUES:
+            row[name] = 'false'
+        else:
+            return row, name
+    return row, None
+
+
+# validate a row with one of the site's forms; a required field has to be
+# in the row, not just have a default, and fields that may be left out of
+# the row are only checked when a value was given for them
+def validate(form_class, row):
+    row, invalid = parse_booleans(row, fields_of(form_class, BooleanField))
+    if invalid:
+        return None, '{}: Not a valid boolean value'.format(invalid)
+
+    data = form_data(row, fields_of(form_class, SelectMultipleField))
+    form = form_class(formdata=data, meta={'csrf': False})
+    form.validate()
+
+    messages = []
+    for field in form:
+        required = any(isinstance(validator, DataRequired) for validator in field.validators)
+        errors = list(field.errors)
+        if required and not field.raw_data and not errors:
+            errors.append('This field is required.')
+        if errors and (required or field.raw_data):
+            messages.append('{}: {}'.format(field.name, ' '.join(errors)))
+
+    return form, '; '.join(messages) or None
+
+
+# split an iterable into lists of at most size items
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# the columns a row of values fills, sorted
+def filled_columns(row):
+    line, values = row
+    return tuple(sorted(values))
+
+
+# insert (line, values) rows with one executemany for each set of columns the
+# rows fill, as an executemany takes its columns from the first row and rows
+# leaving blanks to the column defaults fill fewer of them
+def insert_batch(session, table, rows, report):
+    inserted = []
+    for columns, group in itertools.groupby(sorted(rows, key=filled_columns), key=filled_columns):
+        inserted += insert_rows(session, table, list(group), report)
+    return inserted
+
+
+# insert rows filling the same columns with one executemany; when the batch
+# is rejected, retry row by row so only the offending rows are reported
+def insert_rows(session, table, rows, report):
+    try:
+        with session.begin_nested():
+            session.execute(table.insert(), [values for line, values in rows])
+        report.inserted += len(rows)
+        return rows
+    except StatementError:
+        pass
+
+    inserted = []
+    for line, values in rows:
+        try:
+            with session.begin_nested():
+                session.execute(table.insert(), values)
+            inserted.append((line, values))
+        except StatementError as error:
+            report.error(line, str(error.orig).strip().splitlines()[0])
+
+    report.inserted += len(inserted)
+    return inserted
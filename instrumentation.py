@@ -0,0 +1,132 @@
+import heapq
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# one json object per log record, with any fields passed in extra={'fields': ...}
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# the statements run while serving one request: how many, how long they took
+# in total and the slowest few of them
+class QueryStats(object):
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.started = time.perf_counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        entry = (duration, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    # the slowest statements as (milliseconds, statement), slowest first
+    def slowest_statements(self):
+        return [(duration * 1000, statement) for duration, _, statement in sorted(self.slowest, reverse=True)]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+# times every statement run by any engine, primary or replica, collecting
+# QueryStats per request for a Server-Timing header and the debug footer,
+# and logging slow statements and requests to the fyyur.sql logger
+class QueryInstrumentation(object):
+
+    def __init__(self, app=None):
+        self.logger = logging.getLogger('fyyur.sql')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_query = app.config.get('SLOW_QUERY_MS', 100) / 1000
+        self.slow_request = app.config.get('SLOW_REQUEST_DB_MS', 500) / 1000
+        self.keep = app.config.get('SQL_SLOWEST_KEPT', 5)
+        self.footer = app.config.get('SQL_DEBUG_FOOTER', False)
+        self.logger.setLevel(logging.INFO)
+
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.context_processor(lambda: {"query_stats": g.get('query_stats') if self.footer else None})
+        app.extensions['query_instrumentation'] = self
+
+    # the stats of the current request, or None outside one
+    def stats(self):
+        return g.get('query_stats') if has_request_context() else None
+
+    def _start_request(self):
+        g.query_stats = QueryStats(self.keep)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is None:
+            return
+
+        duration = time.perf_counter() - started
+        stats = self.stats()
+        if stats is not None:
+            stats.record(statement, duration)
+
+        if duration >= self.slow_query:
+            fields = {
+                "event": "slow_query",
+                "duration_ms": round(duration * 1000, 2),
+                "statement": statement,
+                "executemany": executemany,
+                "database": conn.engine.url.database
+            }
+            if has_request_context():
+                fields.update({"method": request.method, "path": request.path, "endpoint": request.endpoint})
+            self.logger.warning('slow query', extra={"fields": fields})
+
+    def _finish_request(self, response):
+        stats = self.stats()
+        if stats is None:
+            return response
+
+        response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(stats.duration * 1000, stats.count))
+        response.headers.add('Server-Timing', 'app;dur={:.2f}'.format(stats.elapsed() * 1000))
+
+        if stats.duration >= self.slow_request:
+            self.logger.warning('slow request', extra={"fields": {
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "queries": stats.count,
+                "db_ms": round(stats.duration * 1000, 2),
+                "total_ms": round(stats.elapsed() * 1000, 2),
+                "slowest": [{"duration_ms": round(ms, 2), "statement": statement}
+                            for ms, statement in stats.slowest_statements()]
+            }})
+        return response
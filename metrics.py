@@ -0,0 +1,121 @@
+import os
+import time
+from flask import g, request, abort, Response, before_render_template, template_rendered
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+
+# gunicorn workers each write their samples to files in this directory, which
+# /metrics then adds up; it must be set before prometheus_client is imported
+def multiprocess_dir():
+    return os.environ.get('prometheus_multiproc_dir') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+# prometheus metrics for every request: counts and latency per route, the
+# time spent rendering templates and in the database, response cache
+# outcomes and connection pool usage, served in the text format at /metrics
+class Metrics(object):
+
+    def __init__(self, app=None, engines=None, allowed=None):
+        self.engines = engines
+        self.allowed = allowed
+        if app is not None:
+            self.init_app(app, engines, allowed)
+
+    # engines() returns the {name: engine} whose pools are reported, and
+    # allowed() whether the current request may see /metrics
+    def init_app(self, app, engines=None, allowed=None):
+        if prometheus_client is None:
+            app.logger.warning('metrics are off: the prometheus_client package is not installed')
+            return
+
+        self.engines = engines or self.engines or dict
+        self.allowed = allowed or self.allowed or (lambda: True)
+        self.requests = prometheus_client.Counter(
+            'fyyur_requests_total', 'Requests served, by route, method and status',
+            ['endpoint', 'method', 'status'])
+        self.latency = prometheus_client.Histogram(
+            'fyyur_request_duration_seconds', 'Time to serve a request, by route',
+            ['endpoint', 'method'])
+        self.render_time = prometheus_client.Histogram(
+            'fyyur_template_render_seconds', 'Time to render a template',
+            ['template'])
+        self.db_time = prometheus_client.Histogram(
+            'fyyur_db_duration_seconds', 'Time spent running statements per request, by route',
+            ['endpoint'])
+        self.queries = prometheus_client.Histogram(
+            'fyyur_db_queries', 'Statements run per request, by route',
+            ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100))
+        self.cache = prometheus_client.Counter(
+            'fyyur_cache_requests_total', 'Response cache lookups by route and result (hit, miss, not_modified)',
+            ['endpoint', 'result'])
+        self.pool = prometheus_client.Gauge(
+            'fyyur_db_pool_connections', 'Connections in each pool by state, summed over live workers',
+            ['engine', 'state'], multiprocess_mode='livesum')
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        app.extensions['metrics'] = self
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+
+        endpoint = request.endpoint or 'unmatched'
+        self.requests.labels(endpoint, request.method, response.status_code).inc()
+        self.latency.labels(endpoint, request.method).observe(time.perf_counter() - started)
+
+        stats = g.get('query_stats')
+        if stats is not None:
+            self.db_time.labels(endpoint).observe(stats.duration)
+            self.queries.labels(endpoint).observe(stats.count)
+
+        cache_result = g.pop('cache_result', None)
+        if cache_result is not None:
+            self.cache.labels(endpoint, cache_result).inc()
+
+        self.sample_pools()
+        return response
+
+    def _start_render(self, app, template, context):
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+    def _finish_render(self, app, template, context):
+        started = g.get('render_started')
+        if started:
+            self.render_time.labels(template.name or 'string').observe(time.perf_counter() - started.pop())
+
+    # record how many connections each pool holds and lends out; pools
+    # without a fixed size, such as sqlite's, are left out
+    def sample_pools(self):
+        for name, engine in self.engines().items():
+            pool = engine.pool
+            if not hasattr(pool, 'checkedout'):
+                continue
+            self.pool.labels(name, 'checked_out').set(pool.checkedout())
+            self.pool.labels(name, 'idle').set(pool.checkedin())
+            self.pool.labels(name, 'overflow').set(max(pool.overflow(), 0))
+            self.pool.labels(name, 'size').set(pool.size())
+
+    # the metrics of every worker when running under gunicorn, else of this process
+    def export(self):
+        if not self.allowed():
+            abort(404)
+        self.sample_pools()
+        if multiprocess_dir():
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return Response(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
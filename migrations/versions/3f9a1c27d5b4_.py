@@ -0,0 +1,50 @@
+"""trigram search indexes
+
+Revision ID: 3f9a1c27d5b4
+Revises: 77cb4fc26942
+Create Date: 2026-10-17 10:12:41.208391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c27d5b4'
+down_revision = '77cb4fc26942'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Artist.genres was created as a string but the model maps it as an array
+    op.alter_column('Artist', 'genres',
+               existing_type=sa.VARCHAR(length=120),
+               type_=postgresql.ARRAY(sa.VARCHAR()),
+               postgresql_using='genres::varchar[]',
+               existing_nullable=False)
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'],
+               postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Venue_city_trgm', 'Venue', ['city'],
+               postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], postgresql_using='gin')
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'],
+               postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_city_trgm', 'Artist', ['city'],
+               postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Artist_city_trgm', table_name='Artist')
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
+    op.drop_index('ix_Venue_city_trgm', table_name='Venue')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
+    op.alter_column('Artist', 'genres',
+               existing_type=postgresql.ARRAY(sa.VARCHAR()),
+               type_=sa.VARCHAR(length=120),
+               postgresql_using="array_to_string(genres, ',')",
+               existing_nullable=False)
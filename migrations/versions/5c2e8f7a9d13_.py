@@ -0,0 +1,47 @@
+"""venue summary table
+
+Revision ID: 5c2e8f7a9d13
+Revises: b81e4d9c0a6f
+Create Date: 2026-10-17 14:22:41.207356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8f7a9d13'
+down_revision = 'b81e4d9c0a6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueSummary',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('upcoming_count', sa.Integer(), nullable=False),
+    sa.Column('next_show', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index('ix_VenueSummary_area', 'VenueSummary', ['city', 'state', 'venue_id'])
+    op.create_index('ix_VenueSummary_next_show', 'VenueSummary', ['next_show'])
+
+    # summarize the venues there already are
+    op.execute('''
+        INSERT INTO "VenueSummary" (venue_id, city, state, name, upcoming_count, next_show)
+        SELECT "Venue".id, "Venue".city, "Venue".state, "Venue".name,
+               count("Shows".id), min("Shows".start_time)
+        FROM "Venue" LEFT OUTER JOIN "Shows"
+          ON "Shows".venue_id = "Venue".id AND "Shows".start_time > LOCALTIMESTAMP
+        GROUP BY "Venue".id
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_VenueSummary_next_show', table_name='VenueSummary')
+    op.drop_index('ix_VenueSummary_area', table_name='VenueSummary')
+    op.drop_table('VenueSummary')
@@ -0,0 +1,100 @@
+"""partition shows by month of start time
+
+Revision ID: 9d4b7e2c1f68
+Revises: 5c2e8f7a9d13
+Create Date: 2026-10-17 16:48:05.913224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b7e2c1f68'
+down_revision = '5c2e8f7a9d13'
+branch_labels = None
+depends_on = None
+
+
+SHOWS_INDEXES = [
+    ('ix_Shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_Shows_start_time_id', ['start_time', 'id']),
+]
+
+
+def upgrade():
+    # declarative partitioning is postgres only; elsewhere Shows stays one table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE "Shows" RENAME TO "Shows_old"')
+    op.execute('ALTER TABLE "Shows_old" RENAME CONSTRAINT "Shows_pkey" TO "Shows_old_pkey"')
+    for name, columns in SHOWS_INDEXES:
+        op.drop_index(name, table_name='Shows_old')
+
+    # the primary key of a partitioned table has to include its partition key
+    op.execute('''
+        CREATE TABLE "Shows" (
+            id integer NOT NULL DEFAULT nextval('"Shows_id_seq"'),
+            start_time timestamp without time zone NOT NULL,
+            venue_id integer NOT NULL,
+            artist_id integer NOT NULL,
+            CONSTRAINT "Shows_pkey" PRIMARY KEY (id, start_time),
+            CONSTRAINT "Shows_venue_id_fkey" FOREIGN KEY (venue_id) REFERENCES "Venue" (id),
+            CONSTRAINT "Shows_artist_id_fkey" FOREIGN KEY (artist_id) REFERENCES "Artist" (id)
+        ) PARTITION BY RANGE (start_time)
+    ''')
+    op.execute('ALTER SEQUENCE "Shows_id_seq" OWNED BY "Shows".id')
+    for name, columns in SHOWS_INDEXES:
+        op.create_index(name, 'Shows', columns)
+
+    # one partition per month from the oldest show to a year ahead, named
+    # Shows_yYYYYmMM; `flask shows-partitions` keeps adding months from there,
+    # and the default partition takes any show beyond them
+    op.execute('''
+        DO $$
+        DECLARE
+            month timestamp := date_trunc('month', coalesce((SELECT min(start_time) FROM "Shows_old"), LOCALTIMESTAMP));
+        BEGIN
+            WHILE month < date_trunc('month', LOCALTIMESTAMP) + interval '13 months' LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF "Shows" FOR VALUES FROM (%L) TO (%L)',
+                               to_char(month, '"Shows_y"YYYY"m"MM'), month, month + interval '1 month');
+                month := month + interval '1 month';
+            END LOOP;
+        END $$
+    ''')
+    op.execute('CREATE TABLE "Shows_default" PARTITION OF "Shows" DEFAULT')
+
+    op.execute('''
+        INSERT INTO "Shows" (id, start_time, venue_id, artist_id)
+        SELECT id, start_time, venue_id, artist_id FROM "Shows_old"
+    ''')
+    op.drop_table('Shows_old')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_table('Shows_flat',
+    sa.Column('id', sa.Integer(), server_default=sa.text('nextval(\'"Shows_id_seq"\')'), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False)
+    )
+    op.execute('''
+        INSERT INTO "Shows_flat" (id, start_time, venue_id, artist_id)
+        SELECT id, start_time, venue_id, artist_id FROM "Shows"
+    ''')
+    op.execute('ALTER SEQUENCE "Shows_id_seq" OWNED BY "Shows_flat".id')
+
+    # dropping the partitioned table drops every partition still attached;
+    # partitions detached by `flask archive-shows` are left as they are
+    op.drop_table('Shows')
+    op.rename_table('Shows_flat', 'Shows')
+    op.create_primary_key('Shows_pkey', 'Shows', ['id'])
+    op.create_foreign_key('Shows_venue_id_fkey', 'Shows', 'Venue', ['venue_id'], ['id'])
+    op.create_foreign_key('Shows_artist_id_fkey', 'Shows', 'Artist', ['artist_id'], ['id'])
+    for name, columns in SHOWS_INDEXES:
+        op.create_index(name, 'Shows', columns)
@@ -0,0 +1,29 @@
+"""shows and venue area indexes
+
+Revision ID: b81e4d9c0a6f
+Revises: 3f9a1c27d5b4
+Create Date: 2026-10-17 11:03:18.552917
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e4d9c0a6f'
+down_revision = '3f9a1c27d5b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Shows_venue_id_start_time', 'Shows', ['venue_id', 'start_time'])
+    op.create_index('ix_Shows_artist_id_start_time', 'Shows', ['artist_id', 'start_time'])
+    op.create_index('ix_Shows_start_time_id', 'Shows', ['start_time', 'id'])
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'])
+
+
+def downgrade():
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.drop_index('ix_Shows_start_time_id', table_name='Shows')
+    op.drop_index('ix_Shows_artist_id_start_time', table_name='Shows')
+    op.drop_index('ix_Shows_venue_id_start_time', table_name='Shows')
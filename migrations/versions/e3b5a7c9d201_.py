@@ -0,0 +1,25 @@
+"""state indexes for the extended search
+
+Revision ID: e3b5a7c9d201
+Revises: 9d4b7e2c1f68
+Create Date: 2026-10-17 18:22:09.417305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b5a7c9d201'
+down_revision = '9d4b7e2c1f68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_state', 'Venue', ['state'])
+    op.create_index('ix_Artist_state', 'Artist', ['state'])
+
+
+def downgrade():
+    op.drop_index('ix_Artist_state', table_name='Artist')
+    op.drop_index('ix_Venue_state', table_name='Venue')
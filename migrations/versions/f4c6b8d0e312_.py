@@ -0,0 +1,24 @@
+"""case-insensitive name index for the artists listing
+
+Revision ID: f4c6b8d0e312
+Revises: e3b5a7c9d201
+Create Date: 2026-10-17 21:04:37.118652
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c6b8d0e312'
+down_revision = 'e3b5a7c9d201'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Artist_upper_name', 'Artist', [sa.text('upper(name)'), 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_Artist_upper_name', table_name='Artist')
@@ -0,0 +1,123 @@
+import re
+from datetime import date
+
+
+# Shows is range partitioned by start_time on postgres, one partition per
+# month named Shows_yYYYYmMM plus a default partition for anything outside them
+PARENT = 'Shows'
+DEFAULT = 'Shows_default'
+PARTITION_NAME = re.compile(r'^Shows_y(\d{4})m(\d{2})$')
+
+
+def quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+# the first day of the month the given day or datetime falls in
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return 'Shows_y{:04d}m{:02d}'.format(month.year, month.month)
+
+
+# whether Shows has been partitioned by the migration
+def is_partitioned(session):
+    return bool(session.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)",
+        {'table': quote(PARENT)}).scalar())
+
+
+# the monthly partitions still attached to Shows as (month, name, tablespace)
+# tuples, oldest first; the tablespace is empty for the database default
+def monthly_partitions(session):
+    rows = session.execute('''
+        SELECT child.relname, coalesce(space.spcname, '')
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        LEFT JOIN pg_tablespace space ON space.oid = child.reltablespace
+        WHERE pg_inherits.inhparent = to_regclass(:table)
+    ''', {'table': quote(PARENT)})
+
+    partitions = []
+    for name, tablespace in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name, tablespace))
+    return sorted(partitions)
+
+
+# create the missing monthly partitions from first through last; postgres
+# refuses a new partition while the default partition holds rows belonging to
+# it, so when it does the default is detached, its rows moved across and
+# attached again
+def create_partitions(session, first, last):
+    existing = {month for month, name, tablespace in monthly_partitions(session)}
+    months = []
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            months.append(month)
+        month = add_months(month, 1)
+
+    if not months:
+        return []
+
+    stray = session.execute(
+        f'SELECT 1 FROM {quote(DEFAULT)} WHERE start_time >= :start AND start_time < :end LIMIT 1',
+        {'start': months[0], 'end': add_months(months[-1], 1)}).first()
+    if stray:
+        session.execute(f'ALTER TABLE {quote(PARENT)} DETACH PARTITION {quote(DEFAULT)}')
+
+    for month in months:
+        bounds = {'start': month, 'end': add_months(month, 1)}
+        session.execute(f'CREATE TABLE {quote(partition_name(month))} PARTITION OF {quote(PARENT)} '
+                        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')")
+        if stray:
+            session.execute(f'''
+                WITH moved AS (
+                    DELETE FROM {quote(DEFAULT)} WHERE start_time >= :start AND start_time < :end RETURNING *
+                )
+                INSERT INTO {quote(PARENT)} SELECT * FROM moved
+            ''', bounds)
+
+    if stray:
+        session.execute(f'ALTER TABLE {quote(PARENT)} ATTACH PARTITION {quote(DEFAULT)} DEFAULT')
+
+    return [partition_name(month) for month in months]
+
+
+# the indexes of a table, already quoted
+def table_indexes(session, table):
+    return [name for name, in session.execute(
+        'SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(:table)',
+        {'table': quote(table)})]
+
+
+# move the monthly partitions before the given month, with their indexes, to
+# a cheaper tablespace, and optionally detach them from Shows so queries no
+# longer see them at all; returns the names of the partitions archived
+def archive_partitions(session, before, tablespace='', detach=False):
+    archived = []
+    for month, name, current in monthly_partitions(session):
+        if month >= before:
+            break
+
+        if tablespace and tablespace != current:
+            session.execute(f'ALTER TABLE {quote(name)} SET TABLESPACE {quote(tablespace)}')
+            for index in table_indexes(session, name):
+                session.execute(f'ALTER INDEX {index} SET TABLESPACE {quote(tablespace)}')
+        elif not detach:
+            continue
+
+        if detach:
+            session.execute(f'ALTER TABLE {quote(PARENT)} DETACH PARTITION {quote(name)}')
+        archived.append(name)
+
+    return archived
@@ -0,0 +1,66 @@
+import itertools
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+
+# a set of read replica engines handed out round-robin; a replica that fails
+# to connect is left out until retry_after seconds have passed, and is then
+# checked with a trivial query before it is used again
+class ReplicaSet(object):
+
+    def __init__(self, engines, retry_after=30):
+        self._lock = threading.Lock()
+        self._engines = list(engines)
+        self._order = itertools.cycle(self._engines)
+        self._down = {}
+        self.retry_after = retry_after
+
+        for engine in self._engines:
+            event.listen(engine, 'handle_error', self._on_error)
+
+    def __bool__(self):
+        return bool(self._engines)
+
+    @property
+    def engines(self):
+        return list(self._engines)
+
+    # the next healthy replica, or None to fall back to the primary
+    def pick(self):
+        for _ in range(len(self._engines)):
+            with self._lock:
+                engine = next(self._order)
+                retry_at = self._down.get(engine)
+
+            if retry_at is None:
+                return engine
+            if retry_at <= time.time() and self.check(engine):
+                return engine
+
+        return None
+
+    # whether a replica answers a trivial query, marking it up or down
+    def check(self, engine):
+        try:
+            with engine.connect() as connection:
+                connection.execute('SELECT 1')
+        except DBAPIError:
+            self.mark_down(engine)
+            return False
+
+        with self._lock:
+            self._down.pop(engine, None)
+        return True
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down[engine] = time.time() + self.retry_after
+
+    # connection failures and lost connections take a replica out of rotation
+    def _on_error(self, context):
+        if context.engine in self._down:
+            return
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta
+from forms import VenueForm
+
+
+STATES = [value for value, label in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, label in VenueForm.genres.kwargs['choices']]
+
+# the words made up names are built from
+ADJECTIVES = ['Blue', 'Red', 'Golden', 'Silver', 'Midnight', 'Velvet', 'Electric', 'Wild', 'Little', 'Grand',
+              'Hollow', 'Neon', 'Paper', 'Iron', 'Crystal', 'Lonesome', 'Howling', 'Broken', 'Sweet', 'Northern',
+              'Quiet', 'Burning', 'Secret', 'Lucky', 'Cosmic', 'Painted', 'Rolling', 'Shady', 'Dusty', 'Crimson']
+NOUNS = ['Owls', 'Wolves', 'Lights', 'Kings', 'Sisters', 'Machines', 'Ghosts', 'Rivers', 'Stars', 'Saints',
+         'Pilots', 'Horses', 'Foxes', 'Tigers', 'Strangers', 'Echoes', 'Shadows', 'Giants', 'Hearts', 'Waves',
+         'Ravens', 'Drifters', 'Sparrows', 'Rebels', 'Dreamers', 'Bandits', 'Mirrors', 'Comets', 'Thieves', 'Angels']
+PLACES = ['Lounge', 'Hall', 'Room', 'Club', 'Theater', 'Tavern', 'Ballroom', 'Garden', 'Cellar', 'Saloon']
+STREETS = ['Main St', 'Oak Ave', 'Market St', 'Broadway', 'Elm St', 'Pine St', 'Maple Ave', '2nd St', 'Park Ave', 'Mill Rd']
+
+# town names found in many states; each state's venues and artists keep to a
+# few of them so the areas of the venues page group several venues each
+TOWNS = ['Springfield', 'Franklin', 'Greenville', 'Clinton', 'Fairview', 'Salem', 'Madison', 'Georgetown',
+         'Arlington', 'Ashland', 'Burlington', 'Manchester', 'Oxford', 'Jackson', 'Milton', 'Riverside']
+TOWNS_PER_STATE = 4
+
+# how likely a show falls on each weekday, monday first
+WEEKDAYS = [0.35, 0.4, 0.55, 0.75, 1.0, 1.0, 0.6]
+
+# evening start times, and how likely each is
+START_HOURS = [(18, 1), (19, 3), (20, 5), (21, 4), (22, 2), (23, 1)]
+
+
+# a generator of the rows of a synthetic catalog; the same seed and anchor
+# give the same rows every time
+class CatalogGenerator(object):
+
+    def __init__(self, seed=0, anchor=None):
+        self.rng = random.Random(seed)
+        self.anchor = anchor or datetime.combine(datetime.now().date(), datetime.min.time())
+        self._names = set()
+        self._towns = {state: random.Random(f'{seed}:{state}').sample(TOWNS, TOWNS_PER_STATE) for state in STATES}
+
+    # a name not given out before, numbered once the word combinations run out
+    def name(self, *words):
+        rng = self.rng
+        name = ' '.join(filter(None, (rng.choice(choices) for choices in words)))
+        while name in self._names:
+            name = '{} {}'.format(name.rsplit(' ', 1)[0] if name[-1].isdigit() else name, rng.randrange(10 ** 6))
+        self._names.add(name)
+        return name
+
+    def place(self):
+        rng = self.rng
+        state = rng.choice(STATES)
+        return {
+            "city": rng.choice(self._towns[state]),
+            "state": state,
+            "phone": '{:03d}-{:03d}-{:04d}'.format(rng.randrange(200, 1000), rng.randrange(1000), rng.randrange(10000)),
+            "genres": rng.sample(GENRES, rng.choice([1, 1, 2, 2, 2, 3, 4])),
+            "image_link": 'https://images.example.com/{:08x}.jpg'.format(rng.getrandbits(32)),
+            "facebook_link": None,
+            "website": None
+        }
+
+    def venues(self, count):
+        for _ in range(count):
+            row = self.place()
+            row.update({
+                "name": self.name(['The', ''], ADJECTIVES, PLACES),
+                "address": '{} {}'.format(self.rng.randrange(1, 9999), self.rng.choice(STREETS)),
+                "seeking_talent": self.rng.random() < 0.6,
+                "seeking_description": 'We are looking for artists to perform here!'
+            })
+            yield row
+
+    def artists(self, count):
+        for _ in range(count):
+            row = self.place()
+            row.update({
+                "name": self.name(['The', '', ''], ADJECTIVES, NOUNS),
+                "seeking_venue": self.rng.random() < 0.5,
+                "seeking_description": 'Looking for a place to perform!'
+            })
+            yield row
+
+    # an evening start time, about three quarters of them in the past: past
+    # shows grow more frequent towards the anchor, and fewer upcoming shows
+    # are booked the further out they are
+    def start_time(self, history_days, future_days):
+        rng = self.rng
+        while True:
+            if rng.random() < 0.75:
+                day = -int(rng.triangular(0, history_days, 0)) - 1
+            else:
+                day = int(rng.triangular(0, future_days, 0))
+            date = self.anchor + timedelta(days=day)
+            if rng.random() < WEEKDAYS[date.weekday()]:
+                break
+        hour = rng.choices([hour for hour, _ in START_HOURS], [weight for _, weight in START_HOURS])[0]
+        return date.replace(hour=hour, minute=rng.choice([0, 0, 30]))
+
+    # shows of the given venues and artists; a few of each play most of the
+    # shows, as popular acts and rooms do
+    def shows(self, count, venue_ids, artist_ids, history_days=730, future_days=180):
+        rng = self.rng
+        for _ in range(count):
+            yield {
+                "venue_id": venue_ids[int(len(venue_ids) * rng.random() ** 2)],
+                "artist_id": artist_ids[int(len(artist_ids) * rng.random() ** 2)],
+                "start_time": self.start_time(history_days, future_days)
+            }
@@ -0,0 +1,86 @@
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+# the app reads its settings from the environment as it is imported; tests
+# run on an in-memory sqlite database unless TEST_DATABASE_URL names another
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('FYYUR_ENV', 'development')
+os.environ.setdefault('CACHE_TYPE', 'null')
+os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'fyyur_test.log'))
+os.environ.setdefault('TEMPLATE_WARMUP', 'false')
+
+import pytest
+import app as fyyur
+
+fyyur.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+# the statement count of the Server-Timing header
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def query_count(response):
+    match = QUERIES.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def postgres():
+    return fyyur.db.engine.dialect.name == 'postgresql'
+
+
+@pytest.fixture
+def app():
+    return fyyur.app
+
+
+# a fresh schema for every test; no app context stays pushed, so each request
+# gets its own, with its own g and database session, as it would when served
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        if postgres():
+            fyyur.db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            fyyur.db.session.commit()
+        fyyur.db.create_all()
+    yield fyyur.db
+    with app.app_context():
+        fyyur.db.session.remove()
+        fyyur.db.drop_all()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+# rows built with just the columns a test cares about, committed and handed
+# back detached with their columns loaded
+@pytest.fixture
+def make(app, db):
+
+    class Make(object):
+
+        def venue(self, name='The Musical Hop', city='San Francisco', state='CA', **values):
+            values = dict(dict(address='1015 Folsom Street', phone='123-123-1234', genres=['Jazz'],
+                               image_link='https://example.com/v.jpg'), **values)
+            return self.add(fyyur.Venue(name=name, city=city, state=state, **values))
+
+        def artist(self, name='Guns N Petals', city='San Francisco', state='CA', **values):
+            values = dict(dict(phone='326-123-5000', genres=['Rock n Roll'],
+                               image_link='https://example.com/a.jpg'), **values)
+            return self.add(fyyur.Artist(name=name, city=city, state=state, **values))
+
+        def show(self, venue, artist, days=1):
+            return self.add(fyyur.Show(venue_id=venue.id, artist_id=artist.id,
+                                       start_time=datetime.now() + timedelta(days=days)))
+
+        def add(self, row):
+            with app.app_context():
+                db.session.add(row)
+                db.session.commit()
+                db.session.refresh(row)
+                db.session.expunge(row)
+            return row
+
+    return Make()
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+import app as fyyur
+from conftest import postgres
+from test_queries import catalog
+
+# the packages of requirements-asgi.txt, and httpx to drive the app
+asgi = pytest.importorskip('asgi')
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('asyncpg')
+
+
+# serve requests from the async handlers only: a request they pass on to the
+# WSGI app fails the test
+async def fetch(paths):
+    application = asgi.Application(fyyur.app)
+
+    async def wsgi(scope, receive, send):
+        raise AssertionError('passed to WSGI: ' + scope['path'])
+
+    application.wsgi = wsgi
+    await application.startup()
+    try:
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+            return await asyncio.gather(*[client.get(path) for path in paths])
+    finally:
+        await application.databases.close()
+
+
+@pytest.fixture
+def catalog_on_postgres(app, make):
+    with app.app_context():
+        if not postgres():
+            pytest.skip('the async handlers run on postgres only')
+    return catalog(make)
+
+
+def test_async_pages_render_on_postgres(catalog_on_postgres):
+    hop, petals = catalog_on_postgres
+    venue, artist, api_venue = asyncio.run(fetch(
+        [f'/venues/{hop.id}', f'/artists/{petals.id}', f'/api/v1/venues/{hop.id}?fields=name,upcoming_shows']))
+    assert venue.status_code == 200 and hop.name in venue.text
+    assert artist.status_code == 200 and petals.name in artist.text
+    assert api_venue.status_code == 200
+    data = api_venue.json()["data"]
+    assert data["name"] == hop.name
+    assert [show["artist_name"] for show in data["upcoming_shows"]] == ['Matt Quevedo']
+
+
+# requests waiting on postgres at the same time each keep their own context
+def test_concurrent_async_requests_keep_their_own_context(catalog_on_postgres, make):
+    hop, petals = catalog_on_postgres
+    venues = [hop] + [make.venue(name=f'Venue {number}') for number in range(8)]
+    responses = asyncio.run(fetch([f'/api/v1/venues/{venue.id}?fields=id,name' for venue in venues]))
+    assert [response.json()["data"] for response in responses] == \
+        [{"id": venue.id, "name": venue.name} for venue in venues]
+
+
+# tasks sharing the event loop's thread each get their own database session
+def test_concurrent_tasks_get_their_own_database_session(app):
+    asgi.task_contexts()
+
+    async def session():
+        with asgi.task_identity(), app.app_context():
+            first = fyyur.db.session()
+            await asyncio.sleep(0)
+            assert fyyur.db.session() is first
+            return first
+
+    async def sessions():
+        return await asyncio.gather(session(), session())
+
+    first, second = asyncio.run(sessions())
+    assert first is not second
@@ -0,0 +1,77 @@
+import app as fyyur
+from autocomplete import NameIndex
+
+
+def names(results):
+    return [name for id, name in results]
+
+
+def names_of(response):
+    return [row['name'] for row in response.get_json()['data']]
+
+
+def test_prefix_matches_come_before_substring_matches():
+    index = NameIndex()
+    index.build([(1, 'The Hop Shop'), (2, 'Hop Along'), (3, 'Shopping Hop'), (4, 'hopscotch'), (5, 'Barn')])
+    assert names(index.search('HOP')) == ['Hop Along', 'hopscotch', 'Shopping Hop', 'The Hop Shop']
+    assert names(index.search('hop', limit=3)) == ['Hop Along', 'hopscotch', 'Shopping Hop']
+    assert index.search('  ') == []
+    assert index.search('zzz') == []
+
+
+def test_added_renamed_and_removed_names():
+    index = NameIndex()
+    index.build([(1, 'Park Stage'), (2, 'Dark Room')])
+    index.add(3, 'Parkside')
+    index.add(1, 'Lakeside')
+    assert names(index.search('park')) == ['Parkside']
+    assert names(index.search('side')) == ['Lakeside', 'Parkside']
+    index.remove(3)
+    index.remove(99)
+    assert names(index.search('side')) == ['Lakeside']
+    assert names(index.search('ark')) == ['Dark Room']
+    assert len(index) == 2
+
+
+def test_a_substring_lookup_scans_at_most_the_scan_limit():
+    rows = [(id, 'Club House {:03d}'.format(id)) for id in range(100)] + [(100, 'Zoo Club House')]
+    index = NameIndex(scan_limit=10)
+    index.build(rows)
+    assert names(index.search('lub hou', limit=5)) == ['Club House 000', 'Club House 001', 'Club House 002',
+                                                       'Club House 003', 'Club House 004']
+    assert len(index.search('lub hou', limit=200)) == 10
+
+    index = NameIndex()
+    index.build(rows)
+    assert names(index.search('lub hou', limit=200))[-1] == 'Zoo Club House'
+
+
+def test_the_index_expires_once_it_is_older_than_the_max_age(monkeypatch):
+    index = NameIndex()
+    assert not index.expired(60)
+    index.build([])
+    clock = [1000.0]
+    monkeypatch.setattr('autocomplete.time.monotonic', lambda: clock[0])
+    index.build([])
+    assert not index.expired(60)
+    clock[0] += 61
+    assert not index.expired(0)
+    assert index.expired(60)
+    assert not index.expired(60)
+
+
+def test_autocomplete_endpoints(app, client, make, monkeypatch):
+    make.venue(name='The Musical Hop')
+    make.artist(name='Guns N Petals')
+    client.get('/')
+    with app.app_context():
+        fyyur.build_name_indexes()
+    make.venue(name='Park Square Live Music & Coffee')
+
+    assert names_of(client.get('/venues/autocomplete?q=music')) == ['The Musical Hop']
+    assert names_of(client.get('/artists/autocomplete?q=PET')) == ['Guns N Petals']
+
+    # the venue added behind the index's back shows up once it is rebuilt
+    monkeypatch.setitem(app.config, 'AUTOCOMPLETE_REFRESH_SECONDS', 1)
+    monkeypatch.setattr(fyyur.venue_names, '_built', fyyur.venue_names._built - 2)
+    assert names_of(client.get('/venues/autocomplete?q=music')) == ['Park Square Live Music & Coffee', 'The Musical Hop']
@@ -0,0 +1,61 @@
+from sqlalchemy import create_engine
+
+import app as fyyur
+from cache import LRUCache
+from replicas import ReplicaSet
+
+
+# a response cache in front of a replica that has seen none of the writes
+def lagging_replica(monkeypatch, lag):
+    replica = create_engine('sqlite://')
+    fyyur.db.metadata.create_all(bind=replica)
+    monkeypatch.setattr(fyyur, 'replicas', ReplicaSet([replica]))
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    monkeypatch.setattr(fyyur.response_cache, 'replica_lag', lag)
+
+
+def test_pages_are_cached_and_invalidated_by_tag(client, make, monkeypatch):
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    hop = make.venue()
+    path = f'/venues/{hop.id}'
+
+    first = client.get(path)
+    assert b'The Musical Hop' in first.data
+    assert client.get(path, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    with fyyur.app.app_context():
+        fyyur.db.session.query(fyyur.Venue).filter_by(id=hop.id).update({"name": "The Musical Hip"})
+        fyyur.db.session.commit()
+    assert b'The Musical Hop' in client.get(path).data
+
+    fyyur.response_cache.invalidate(f'venue:{hop.id}')
+    assert b'The Musical Hip' in client.get(path).data
+
+
+def test_pages_cached_just_after_an_invalidation_are_read_from_the_primary(client, make, monkeypatch):
+    lagging_replica(monkeypatch, lag=60)
+    hop = make.venue()
+    fyyur.response_cache.invalidate(f'venue:{hop.id}')
+    assert b'The Musical Hop' in client.get(f'/venues/{hop.id}').data
+
+
+def test_pages_are_read_from_the_replicas_once_they_caught_up(client, make, monkeypatch):
+    lagging_replica(monkeypatch, lag=0)
+    hop = make.venue()
+    fyyur.response_cache.invalidate(f'venue:{hop.id}')
+    assert b'The Musical Hop' not in client.get(f'/venues/{hop.id}').data
+
+
+def test_a_cache_timeout_of_0_keeps_pages_until_they_are_invalidated(client, make, monkeypatch):
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    monkeypatch.setattr(fyyur.response_cache, 'timeout', 0)
+    hop = make.venue()
+    path = f'/venues/{hop.id}'
+
+    first = client.get(path)
+    assert first.status_code == 200
+    assert client.get(path, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    with fyyur.app.app_context():
+        fyyur.db.session.query(fyyur.Venue).filter_by(id=hop.id).update({"name": "The Musical Hip"})
+        fyyur.db.session.commit()
+    assert b'The Musical Hop' in client.get(path).data
@@ -0,0 +1,20 @@
+import explain
+from test_queries import catalog
+
+
+def test_hot_queries_reach_shows_through_an_index(app, make):
+    catalog(make)
+    result = app.test_cli_runner().invoke(args=['explain'])
+    assert result.exit_code == 0, result.output
+    verdicts = [line.split() for line in result.output.splitlines() if not line.startswith(' ')]
+    assert verdicts == [['ok', name] for name in
+                        ['venues', 'show_venue', 'show_artist', 'search_venues', 'search_artists', 'shows']]
+
+
+def test_sequential_scans_are_found_in_both_dialects():
+    plan = ['Seq Scan on "Shows"  (cost=0.00..1.01 rows=1 width=4)',
+            'Index Scan using ix_shows_venue_id on "Shows"',
+            'SCAN Shows',
+            'SCAN Shows USING INDEX ix_shows_start_time',
+            'SCAN Venue']
+    assert explain.sequential_scans(plan, ['Shows']) == [plan[0], plan[2]]
@@ -0,0 +1,41 @@
+import io
+
+import app as fyyur
+
+ELSEWHERE = {'REMOTE_ADDR': '203.0.113.7'}
+
+
+def export(client, kind):
+    response = client.get(f'/export/{kind}.csv')
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+# the rows without their ids, which the import leaves to the database, and
+# in name order, as the import may insert them in another
+def without_ids(text):
+    return sorted(line.split(',', 1)[1] for line in text.splitlines())
+
+
+def test_an_export_imports_back_to_the_same_rows(app, client, make, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', True)
+    make.venue('Hop', seeking_talent=False, website='https://hop.example.com', genres=['Jazz', 'Folk'])
+    make.venue('Park', city='New York', state='NY', seeking_talent=True)
+    exported = export(client, 'venues')
+    assert ',false,' in exported
+
+    with app.app_context():
+        fyyur.Venue.query.delete()
+        fyyur.db.session.commit()
+    response = client.post('/import/venues', data={'file': (io.BytesIO(exported.encode()), 'venues.csv')})
+    assert response.get_json()['errors'] == []
+
+    assert without_ids(export(client, 'venues')) == without_ids(exported)
+
+
+def test_import_and_export_are_only_served_to_internal_requests(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', False)
+    assert client.get('/export/venues.csv', environ_base=ELSEWHERE).status_code == 404
+    response = client.post('/import/venues', environ_base=ELSEWHERE,
+                           data={'file': (io.BytesIO(b'name\n'), 'venues.csv')})
+    assert response.status_code == 404
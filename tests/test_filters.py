@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+import app as fyyur
+from test_queries import catalog
+
+MAY_21 = datetime(2030, 5, 21, 21, 30)
+
+
+def test_datetimes_and_strings_format_alike():
+    assert fyyur.format_datetime(MAY_21) == 'Tue 05, 21, 2030 9:30PM'
+    assert fyyur.format_datetime(MAY_21, 'full') == 'Tuesday May, 21, 2030 at 9:30PM'
+    assert fyyur.format_datetime('2030-05-21 21:30:00', 'full') == 'Tuesday May, 21, 2030 at 9:30PM'
+    assert fyyur.format_datetime(MAY_21, 'y-MM-dd HH:mm') == '2030-05-21 21:30'
+
+
+@pytest.mark.parametrize('value, error', [('not a date', ValueError), ('', ValueError),
+                                          (None, TypeError), (20300521, TypeError)])
+def test_values_that_are_not_datetimes_are_errors(value, error):
+    with pytest.raises(error):
+        fyyur.format_datetime(value)
+    # and stay errors, rather than a memoized result
+    with pytest.raises(error):
+        fyyur.format_datetime(value)
+
+
+def test_pages_list_their_shows_with_formatted_start_times(client, make):
+    hop, petals = catalog(make)
+    with fyyur.app.app_context():
+        start_times = [start_time for start_time, in
+                       fyyur.db.session.query(fyyur.Show.start_time).filter(fyyur.Show.venue_id == hop.id)]
+    page = client.get(f'/venues/{hop.id}').get_data(as_text=True)
+    assert len(start_times) == 2
+    for start_time in start_times:
+        assert fyyur.format_datetime(start_time, 'full') in page
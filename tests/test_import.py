@@ -0,0 +1,77 @@
+import io
+from datetime import datetime
+
+import pytest
+import app as fyyur
+from conftest import postgres
+
+HEADER = 'name,city,state,address,phone,image_link,genres,website,seeking_description\n'
+
+
+def import_venues(app, text):
+    with app.app_context():
+        report = fyyur.import_catalog('venues', io.StringIO(text), 'csv')
+        venues = fyyur.db.session.query(fyyur.Venue.name, fyyur.Venue.website, fyyur.Venue.seeking_description) \
+            .order_by(fyyur.Venue.name).all()
+    return report, venues
+
+
+def test_import_keeps_every_value_of_rows_with_different_blanks(app, db):
+    default = fyyur.Venue.seeking_description.default.arg
+    report, venues = import_venues(app, HEADER +
+        'Hop,San Francisco,CA,1 Main St,123-123-1234,https://example.com/1.jpg,Jazz,,Books bands\n'
+        'Park,New York,NY,2 Main St,123-123-1234,https://example.com/2.jpg,Jazz,https://park.example.com,\n'
+        'Cove,Boston,MA,3 Main St,123-123-1234,https://example.com/3.jpg,Jazz;Folk,https://cove.example.com,Quiet\n')
+    assert report.errors == []
+    assert report.inserted == 3
+    assert [tuple(venue) for venue in venues] == [
+        ('Cove', 'https://cove.example.com', 'Quiet'),
+        ('Hop', None, 'Books bands'),
+        ('Park', 'https://park.example.com', default)]
+
+
+# sqlite does not enforce the length of a varchar
+def test_import_reports_only_the_rows_the_database_rejects(app, db):
+    with app.app_context():
+        if not postgres():
+            pytest.skip('needs postgres')
+    report, venues = import_venues(app, HEADER +
+        'Hop,San Francisco,CA,1 Main St,123-123-1234,https://example.com/1.jpg,Jazz,,\n'
+        'Park,New York,NY,2 Main St,123-123-1234,https://example.com/2.jpg,Jazz,https://park.example.com/'
+        + 'x' * 300 + ',\n')
+    assert report.inserted == 1
+    assert [line for line, message in report.errors] == [3]
+    assert [name for name, website, description in venues] == ['Hop']
+
+
+def test_import_leaves_missing_columns_to_the_column_defaults(app, db):
+    with app.app_context():
+        report = fyyur.import_catalog('venues', io.StringIO(HEADER +
+            'Hop,San Francisco,CA,1 Main St,123-123-1234,https://example.com/1.jpg,Jazz,,\n'), 'csv')
+        assert report.errors == []
+        assert fyyur.Venue.query.one().seeking_talent is True
+
+
+def test_import_reads_booleans_case_insensitively(app, db):
+    rows = ['{"name": "%s", "city": "Boston", "state": "MA", "phone": "123-123-1234", '
+            '"image_link": "https://example.com/a.jpg", "genres": ["Jazz"], "seeking_venue": %s}' % row
+            for row in (('A', '"False"'), ('B', '"TRUE"'), ('C', 'false'), ('D', '"no"'), ('E', '"maybe"'))]
+    with app.app_context():
+        report = fyyur.import_catalog('artists', io.StringIO('\n'.join(rows)), 'jsonl')
+        artists = fyyur.db.session.query(fyyur.Artist.name, fyyur.Artist.seeking_venue) \
+            .order_by(fyyur.Artist.name).all()
+    assert report.errors == [(5, 'seeking_venue: Not a valid boolean value')]
+    assert [tuple(artist) for artist in artists] == [('A', False), ('B', True), ('C', False), ('D', False)]
+
+
+def test_import_rejects_a_show_without_a_start_time(app, make):
+    venue = make.venue()
+    artist = make.artist()
+    with app.app_context():
+        report = fyyur.import_catalog('shows', io.StringIO(
+            'venue_id,artist_id,start_time\n'
+            f'{venue.id},{artist.id},\n'
+            f'{venue.id},{artist.id},2030-01-01 20:00:00\n'), 'csv')
+        start_times = fyyur.db.session.query(fyyur.Show.start_time).all()
+    assert report.errors == [(2, 'start_time: This field is required.')]
+    assert [start_time for start_time, in start_times] == [datetime(2030, 1, 1, 20)]
@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import app as fyyur
+from conftest import query_count
+from instrumentation import JSONFormatter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_responses_report_their_queries_and_time(client, make):
+    make.venue()
+    response = client.get('/venues')
+    assert query_count(response) == 1
+    assert any(value.startswith('app;dur=') for value in response.headers.getlist('Server-Timing'))
+
+
+def test_slow_queries_and_requests_are_logged(client, make, caplog, monkeypatch):
+    make.venue()
+    monkeypatch.setattr(fyyur.instrumentation, 'slow_query', 0)
+    monkeypatch.setattr(fyyur.instrumentation, 'slow_request', 0)
+    with caplog.at_level(logging.INFO, logger='fyyur.sql'):
+        client.get('/venues')
+
+    fields = [record.fields for record in caplog.records if record.name == 'fyyur.sql']
+    assert [entry["event"] for entry in fields] == ['slow_query', 'slow_request']
+    assert fields[0]["endpoint"] == 'venues'
+    assert fields[1]["queries"] == 1
+    assert fields[1]["slowest"][0]["statement"] == fields[0]["statement"]
+
+    line = JSONFormatter().format(caplog.records[-1])
+    assert json.loads(line)["event"] == 'slow_request'
+
+
+# whether importing the app in a fresh interpreter creates the log file
+def creates_log_file(tmp_path, **environ):
+    log_file = tmp_path / 'fyyur.log'
+    env = dict(os.environ, DATABASE_URL='sqlite://', CACHE_TYPE='null', TEMPLATE_WARMUP='false',
+               SECRET_KEY='not so secret', LOG_FILE=str(log_file))
+    env.update(environ)
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=env, check=True)
+    return log_file.exists()
+
+
+def test_the_log_file_is_only_written_outside_debug_mode(tmp_path):
+    assert creates_log_file(tmp_path, FYYUR_ENV='production')
+    assert not creates_log_file(tmp_path / 'debug', FYYUR_ENV='development')
+    assert not creates_log_file(tmp_path / 'none', FYYUR_ENV='production', LOG_FILE='')
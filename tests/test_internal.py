@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine
+
+import app as fyyur
+from replicas import ReplicaSet
+
+ELSEWHERE = {'REMOTE_ADDR': '203.0.113.7'}
+PROXIED = {'X-Forwarded-For': '203.0.113.7'}
+
+
+@pytest.fixture
+def production(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', False)
+    monkeypatch.setitem(app.config, 'INTERNAL_TOKEN', '')
+    monkeypatch.setitem(app.config, 'INTERNAL_ADDRESSES', [])
+
+
+def test_pool_status_is_only_served_to_internal_addresses(app, client, production, monkeypatch):
+    assert client.get('/debug/pool').status_code == 404
+
+    monkeypatch.setitem(app.config, 'INTERNAL_ADDRESSES', ['127.0.0.1'])
+    assert client.get('/debug/pool').status_code == 200
+    assert client.get('/debug/pool', environ_base=ELSEWHERE).status_code == 404
+
+
+# behind a reverse proxy on the same host every request comes from loopback
+def test_forwarded_requests_never_count_as_internal_addresses(app, client, production, monkeypatch):
+    monkeypatch.setitem(app.config, 'INTERNAL_ADDRESSES', ['127.0.0.1'])
+    assert client.get('/debug/pool', headers=PROXIED).status_code == 404
+    assert client.get('/debug/pool', headers={'Forwarded': 'for=203.0.113.7'}).status_code == 404
+
+
+def test_pool_status_is_served_with_the_internal_token(app, client, production, monkeypatch):
+    bearer = {'Authorization': 'Bearer s3cret', **PROXIED}
+    assert client.get('/debug/pool', headers=bearer).status_code == 404
+
+    monkeypatch.setitem(app.config, 'INTERNAL_TOKEN', 's3cret')
+    assert client.get('/debug/pool', headers=bearer).status_code == 200
+    assert client.get('/debug/pool', headers={'Authorization': 'Bearer guess', **PROXIED}).status_code == 404
+    assert client.get('/debug/pool', headers=PROXIED).status_code == 404
+
+
+def test_pool_status_is_served_to_anyone_in_debug_mode(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', True)
+    response = client.get('/debug/pool', environ_base=ELSEWHERE)
+    assert response.status_code == 200
+    assert response.get_json()["pool"]
+
+
+def test_pool_status_reports_the_replica_pools(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', True)
+    monkeypatch.setattr(fyyur, 'replicas', ReplicaSet([create_engine('sqlite://'), create_engine('sqlite://')]))
+    replicas = client.get('/debug/pool').get_json()["replicas"]
+    assert [replica["pool"] for replica in replicas] == ['SingletonThreadPool', 'SingletonThreadPool']
@@ -0,0 +1,52 @@
+import pytest
+
+import app as fyyur
+from cache import LRUCache
+from conftest import postgres
+
+prometheus_client = pytest.importorskip('prometheus_client')
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def sample(name, **labels):
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def metrics(app):
+    if 'metrics' not in app.extensions:
+        pytest.skip('metrics are off')
+
+
+def test_requests_are_counted_and_timed_by_route(metrics, client, make, monkeypatch):
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    make.venue()
+    names = ['fyyur_requests_total', 'fyyur_request_duration_seconds_count', 'fyyur_db_queries_count',
+             'fyyur_template_render_seconds_count']
+    labels = [dict(endpoint='venues', method='GET', status='200'), dict(endpoint='venues', method='GET'),
+              dict(endpoint='venues'), dict(template='pages/venues.html')]
+    before = [sample(name, **label) for name, label in zip(names, labels)]
+    misses = sample('fyyur_cache_requests_total', endpoint='venues', result='miss')
+    hits = sample('fyyur_cache_requests_total', endpoint='venues', result='hit')
+
+    client.get('/venues')
+    client.get('/venues')
+
+    # the second request is a cache hit, which neither queries nor renders
+    assert [sample(name, **label) - count for name, label, count in zip(names, labels, before)] == [2, 2, 2, 1]
+    assert sample('fyyur_cache_requests_total', endpoint='venues', result='miss') - misses == 1
+    assert sample('fyyur_cache_requests_total', endpoint='venues', result='hit') - hits == 1
+
+
+def test_metrics_are_exported_in_the_text_format(metrics, app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'DEBUG', True)
+    client.get('/venues')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    families = {family.name for family in text_string_to_metric_families(response.get_data(as_text=True))}
+    assert {'fyyur_requests', 'fyyur_request_duration_seconds', 'fyyur_db_queries'} <= families
+
+    with app.app_context():
+        if postgres():
+            assert 'fyyur_db_pool_connections' in families
@@ -0,0 +1,46 @@
+import base64
+import json
+import re
+
+import app as fyyur
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_cursor_round_trips(make):
+    venue, artist = make.venue(), make.artist()
+    show = make.show(venue, artist, days=3)
+    columns = (fyyur.Show.start_time, fyyur.Show.id)
+    assert fyyur.decode_cursor(fyyur.encode_cursor([show.start_time, show.id]), columns) == \
+        [show.start_time, show.id]
+
+
+def test_api_rejects_malformed_cursors(client, db):
+    for after in [cursor([1, 2]), cursor({"a": 1}), cursor(['2020-01-01T00:00:00', 'x']),
+                  cursor([None, 1]), cursor(['99999-01-01', 1]), 'not a cursor']:
+        response = client.get('/api/v1/shows', query_string={'after': after})
+        assert response.status_code == 400, after
+
+    response = client.get('/api/v1/artists', query_string={'after': cursor([1, 2])})
+    assert response.status_code == 400
+
+
+def test_pages_flash_malformed_cursors(client, db):
+    for path in ['/shows', '/artists']:
+        response = client.get(path, query_string={'after': cursor([1, 2])})
+        assert response.status_code == 200, path
+        assert b'Not a valid page!' in response.data, path
+
+
+def test_artists_sort_and_jump_to_letters_whatever_the_case(client, make):
+    for name in ['apple', 'Banana', 'avocado', 'Cherry', 'blueberry']:
+        make.artist(name=name)
+
+    def listed(**query):
+        return re.findall(r'<h5>(.*?)</h5>', client.get('/artists', query_string=query).get_data(as_text=True))
+
+    assert listed() == ['apple', 'avocado', 'Banana', 'blueberry', 'Cherry']
+    assert listed(letter='B') == ['Banana', 'blueberry', 'Cherry']
+    assert listed(letter='B', per_page=1) == ['Banana']
@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+import app as fyyur
+import partitions
+from conftest import postgres
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_months_and_partition_names():
+    assert partitions.month_start(datetime(2026, 10, 17, 20, 30)) == date(2026, 10, 1)
+    assert partitions.add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert partitions.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partitions.partition_name(date(2027, 3, 1)) == 'Shows_y2027m03'
+    assert partitions.PARTITION_NAME.match('Shows_y2027m03').groups() == ('2027', '03')
+    assert partitions.quote('a"b') == '"a""b"'
+
+
+# run `flask db` on the test database in a fresh interpreter, as a deploy would
+def flask_db(*args):
+    env = dict(os.environ, DATABASE_URL=os.environ['DATABASE_URL'], FLASK_APP='app.py', LOG_FILE='')
+    subprocess.run([sys.executable, '-m', 'flask', 'db'] + list(args), cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+
+
+# run a statement in its own transaction, returning its rows if it has any
+def execute(sql, **params):
+    with fyyur.app.app_context():
+        result = fyyur.db.session.execute(sql, params)
+        rows = result.fetchall() if result.returns_rows else None
+        fyyur.db.session.commit()
+    return rows
+
+
+# the test database migrated from empty to the latest revision, with two shows
+# in the old flat Shows table before it is partitioned, and back down again
+@pytest.fixture
+def migrated(app):
+    with app.app_context():
+        if not postgres():
+            pytest.skip('Shows is only partitioned on postgres')
+        fyyur.db.drop_all()
+    execute('DROP TABLE IF EXISTS alembic_version')
+
+    flask_db('upgrade', '5c2e8f7a9d13')
+    execute('''INSERT INTO "Venue" (name, city, state, address, phone, image_link, genres, seeking_talent,
+                                    seeking_description)
+               VALUES ('The Musical Hop', 'San Francisco', 'CA', '1015 Folsom Street', '123-123-1234', 'x',
+                       '{Jazz}', true, 'd')''')
+    execute('''INSERT INTO "Artist" (name, city, state, phone, image_link, genres, seeking_venue, seeking_description)
+               VALUES ('Guns N Petals', 'San Francisco', 'CA', '326-123-5000', 'x', '{Rock}', true, 'd')''')
+    execute('''INSERT INTO "Shows" (start_time, venue_id, artist_id)
+               VALUES (LOCALTIMESTAMP - interval '40 days', 1, 1), (LOCALTIMESTAMP + interval '3 years', 1, 1)''')
+    flask_db('upgrade')
+    yield
+
+    # the oldest migrations cannot be downgraded, so start the schema afresh
+    execute('DROP SCHEMA public CASCADE')
+    execute('CREATE SCHEMA public')
+
+
+def constraints():
+    return dict(execute('''SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+                           WHERE conrelid = '"Shows"'::regclass AND contype IN ('p', 'f')'''))
+
+
+def test_migrations_partition_shows_and_back(migrated):
+    assert constraints() == {
+        'Shows_pkey': 'PRIMARY KEY (id, start_time)',
+        'Shows_venue_id_fkey': 'FOREIGN KEY (venue_id) REFERENCES "Venue"(id)',
+        'Shows_artist_id_fkey': 'FOREIGN KEY (artist_id) REFERENCES "Artist"(id)'
+    }
+    with fyyur.app.app_context():
+        assert fyyur.shows_partitioned()
+        months = partitions.monthly_partitions(fyyur.db.session)
+    assert months[0][0] == partitions.month_start(datetime.now() - timedelta(days=40))
+    assert len(months) >= 14
+    assert execute('SELECT id FROM "Shows_default"') == [(2,)]
+
+    flask_db('downgrade', '5c2e8f7a9d13')
+    assert constraints() == {
+        'Shows_pkey': 'PRIMARY KEY (id)',
+        'Shows_venue_id_fkey': 'FOREIGN KEY (venue_id) REFERENCES "Venue"(id)',
+        'Shows_artist_id_fkey': 'FOREIGN KEY (artist_id) REFERENCES "Artist"(id)'
+    }
+    assert execute('SELECT id FROM "Shows" ORDER BY id') == [(1,), (2,)]
+    flask_db('upgrade')
+
+
+def test_partitioned_shows_are_found_by_id(app, migrated):
+    with fyyur.app.app_context():
+        show = fyyur.Show(venue_id=1, artist_id=1, start_time=datetime.now() + timedelta(days=5))
+        fyyur.db.session.add(show)
+        fyyur.db.session.commit()
+        assert show.id == 3
+        assert fyyur.Show.query.get(1).start_time < datetime.now()
+
+        fyyur.db.session.add(fyyur.Show(venue_id=99, artist_id=1, start_time=datetime.now()))
+        with pytest.raises(IntegrityError):
+            fyyur.db.session.commit()
+        fyyur.db.session.rollback()
+
+    client = app.test_client()
+    assert client.get('/api/v1/shows/3').get_json()["data"]["venue_id"] == 1
+    assert client.get('/venues/1').status_code == 200
+
+
+def test_new_partitions_take_their_shows_from_the_default(migrated):
+    with fyyur.app.app_context():
+        last = partitions.monthly_partitions(fyyur.db.session)[-1][0]
+        created = partitions.create_partitions(fyyur.db.session, last, partitions.add_months(last, 36))
+        fyyur.db.session.commit()
+    assert len(created) == 36
+    assert execute('SELECT count(*) FROM "Shows_default"') == [(0,)]
+    assert execute('SELECT count(*) FROM "Shows"') == [(2,)]
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# load wsgi.py in a fresh interpreter, as gunicorn would
+def start(**environ):
+    env = {name: value for name, value in os.environ.items() if name not in ('FYYUR_ENV', 'SECRET_KEY')}
+    env.update(DATABASE_URL='sqlite://', CACHE_TYPE='null', TEMPLATE_WARMUP='false', WEB_CONCURRENCY='1')
+    env.update(environ)
+    return subprocess.run([sys.executable, '-c', 'import wsgi; print(wsgi.app.config["ENV"])'],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def test_production_refuses_to_start_without_a_secret_key():
+    result = start()
+    assert result.returncode != 0
+    assert 'set SECRET_KEY' in result.stderr
+
+    result = start(SECRET_KEY='not so secret')
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['production']
+
+
+# a cache in each worker would never hear of the writes the others make
+def test_several_workers_refuse_the_in_process_cache():
+    result = start(SECRET_KEY='not so secret', CACHE_TYPE='simple', WEB_CONCURRENCY='4')
+    assert result.returncode != 0
+    assert 'CACHE_TYPE simple cannot be shared by 4 workers' in result.stderr
+
+    assert start(SECRET_KEY='not so secret', CACHE_TYPE='simple').returncode == 0
+    assert start(SECRET_KEY='not so secret', WEB_CONCURRENCY='4').returncode == 0
+
+
+def test_load_app_will_not_switch_profiles(app):
+    import wsgi
+    assert wsgi.load_app() is app
+    with pytest.raises(RuntimeError):
+        wsgi.load_app('production')
+    assert os.environ['FYYUR_ENV'] == 'development'
+
+
+def test_metrics_are_only_served_to_internal_requests(app, client, monkeypatch):
+    if 'metrics' not in app.extensions:
+        pytest.skip('metrics are off')
+    monkeypatch.setitem(app.config, 'DEBUG', False)
+    monkeypatch.setitem(app.config, 'INTERNAL_TOKEN', 's3cret')
+    monkeypatch.setitem(app.config, 'INTERNAL_ADDRESSES', [])
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
@@ -0,0 +1,58 @@
+from conftest import query_count
+import app as fyyur
+
+
+# a small catalog: two venues in two areas, two artists, past and upcoming shows
+def catalog(make):
+    hop = make.venue()
+    dueling = make.venue(name='The Dueling Pianos Bar', city='New York', state='NY')
+    petals = make.artist()
+    quevedo = make.artist(name='Matt Quevedo', city='New York', state='NY')
+    for venue, artist, days in [(hop, petals, -30), (hop, quevedo, 5), (dueling, quevedo, 12), (dueling, petals, -2)]:
+        make.show(venue, artist, days)
+    with fyyur.app.app_context():
+        fyyur.refresh_venue_summary()
+        fyyur.db.session.commit()
+    return hop, petals
+
+
+def test_listings_run_one_query(client, make):
+    catalog(make)
+    for path in ['/venues', '/artists', '/shows']:
+        response = client.get(path)
+        assert response.status_code == 200, path
+        assert query_count(response) == 1, path
+
+
+def test_detail_pages_run_two_queries(client, make):
+    hop, petals = catalog(make)
+    for path in [f'/venues/{hop.id}', f'/artists/{petals.id}']:
+        response = client.get(path)
+        assert response.status_code == 200, path
+        assert query_count(response) == 2, path
+
+
+# the query counts do not grow with the data: the same pages after the
+# catalog grew tenfold and more run as many queries as before
+def test_query_counts_do_not_grow_with_the_catalog(app, client, make):
+    hop, petals = catalog(make)
+    paths = ['/venues', '/artists', '/shows', f'/venues/{hop.id}', f'/artists/{petals.id}']
+    before = [query_count(client.get(path)) for path in paths]
+
+    with app.app_context():
+        fyyur.seed_catalog(venues=30, artists=30, shows=200, seed=1)
+    for days in range(-5, 5):
+        make.show(hop, petals, days)
+    after = [query_count(client.get(path)) for path in paths]
+
+    assert None not in before
+    assert after == before
+
+
+def test_venues_groups_areas_with_upcoming_counts(client, make):
+    catalog(make)
+    with fyyur.app.test_request_context():
+        areas = fyyur.venues_by_area()
+    assert [(area["city"], [(venue["name"], venue["num_upcoming_shows"]) for venue in area["venues"]])
+            for area in areas] == [('New York', [('The Dueling Pianos Bar', 1)]),
+                                   ('San Francisco', [('The Musical Hop', 1)])]
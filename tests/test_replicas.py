@@ -0,0 +1,40 @@
+from flask import g
+from sqlalchemy import create_engine
+
+import app as fyyur
+from replicas import ReplicaSet
+
+
+def test_a_request_reads_from_one_replica(app, db, monkeypatch):
+    engines = [create_engine('sqlite://'), create_engine('sqlite://')]
+    monkeypatch.setattr(fyyur, 'replicas', ReplicaSet(engines))
+
+    picked = []
+    for _ in range(4):
+        with app.test_request_context():
+            g.use_replica = True
+            binds = {fyyur.db.session.get_bind() for _ in range(3)}
+            fyyur.db.session.remove()
+        assert len(binds) == 1
+        picked += binds
+
+    # and the requests take the replicas in turn
+    assert picked == engines + engines
+
+
+def test_writes_and_pinned_requests_go_to_the_primary(app, db, monkeypatch):
+    monkeypatch.setattr(fyyur, 'replicas', ReplicaSet([create_engine('sqlite://')]))
+
+    with app.test_request_context():
+        g.use_replica = False
+        assert fyyur.db.session.get_bind() is fyyur.db.engine
+        fyyur.db.session.remove()
+
+    with app.test_request_context():
+        g.use_replica = True
+        session = fyyur.db.session()
+        session._flushing = True
+        assert session.get_bind() is fyyur.db.engine
+        session._flushing = False
+        assert session.get_bind() is not fyyur.db.engine
+        fyyur.db.session.remove()
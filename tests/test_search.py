@@ -0,0 +1,59 @@
+import pytest
+
+import app as fyyur
+import explain
+from conftest import postgres
+
+
+def search(app, model, term):
+    with app.app_context():
+        return [name for id, name in fyyur.search_query(model, term)]
+
+
+def test_names_matching_the_term_rank_first(app, make):
+    for name in ['The Hop Shop', 'Hop Along', 'Shopping Hop', 'Bluegrass Barn']:
+        make.artist(name=name)
+    assert search(app, fyyur.Artist, 'hop')[0] == 'Hop Along'
+    assert set(search(app, fyyur.Artist, 'hop')) == {'The Hop Shop', 'Hop Along', 'Shopping Hop'}
+    assert search(app, fyyur.Artist, 'BARN') == ['Bluegrass Barn']
+
+
+def test_like_wildcards_match_literally(app, make):
+    for name in ['100% Jazz', '1000 Jazz', 'Under_score', 'Underscore']:
+        make.venue(name=name)
+    assert search(app, fyyur.Venue, '100%') == ['100% Jazz']
+    assert search(app, fyyur.Venue, 'under_') == ['Under_score']
+    assert search(app, fyyur.Venue, '\\') == []
+
+
+def test_extended_search_matches_areas_states_and_genres(app, make, monkeypatch):
+    make.venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    make.venue(name='Park Square Live', city='New York', state='NY', genres=['Folk'])
+
+    assert search(app, fyyur.Venue, 'san fran, ca') == ['The Musical Hop']
+    assert search(app, fyyur.Venue, 'ny') == ['Park Square Live']
+    assert search(app, fyyur.Venue, 'folk') == ['Park Square Live']
+    assert search(app, fyyur.Venue, 'york') == ['Park Square Live']
+
+    monkeypatch.setitem(app.config, 'SEARCH_EXTENDED', False)
+    assert search(app, fyyur.Venue, 'folk') == []
+
+
+def test_search_page_lists_the_matches(client, make):
+    make.venue(name='The Musical Hop')
+    response = client.post('/venues/search', data={'search_term': 'musical'})
+    assert response.status_code == 200
+    assert b'The Musical Hop' in response.data
+
+
+# every part of the search goes through an index on postgres
+def test_extended_search_does_not_scan_the_table(app, make):
+    make.artist()
+    with app.app_context():
+        if not postgres():
+            pytest.skip('the trigram indexes are postgres only')
+        fyyur.db.session.execute('SET LOCAL enable_seqscan = off')
+        for term in ['petals', 'ca', 'san fran, ca', 'rock n roll']:
+            plan = explain.query_plan(fyyur.db.session, fyyur.search_query(fyyur.Artist, term))
+            assert explain.sequential_scans(plan, ['Artist']) == [], plan
+        fyyur.db.session.rollback()
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+import app as fyyur
+
+ANCHOR = datetime(2030, 1, 1)
+
+
+# seed an empty schema and read every row back
+def seeded(app, seed):
+    with app.app_context():
+        fyyur.db.session.remove()
+        fyyur.db.drop_all()
+        fyyur.db.create_all()
+        fyyur.seed_catalog(venues=20, artists=30, shows=100, seed=seed, anchor=ANCHOR)
+        return {model.__name__: [tuple(row) for row in fyyur.db.session.query(*model.__table__.columns)
+                                 .order_by(model.__table__.c.id)]
+                for model in (fyyur.Venue, fyyur.Artist, fyyur.Show)}
+
+
+def test_the_same_seed_gives_the_same_catalog(app, db):
+    first = seeded(app, seed=7)
+    assert [len(rows) for rows in first.values()] == [20, 30, 100]
+    assert seeded(app, seed=7) == first
+    assert seeded(app, seed=8) != first
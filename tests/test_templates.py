@@ -0,0 +1,47 @@
+from jinja2 import Environment, ModuleLoader
+
+import app as fyyur
+from cache import LRUCache
+from test_queries import catalog
+
+
+# fragment caching on, as with any CACHE_TYPE but null
+def fragments(monkeypatch):
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    monkeypatch.setattr(fyyur.response_cache, 'fragments', LRUCache())
+
+
+def test_fragments_render_once_per_key_and_tag_version(app, monkeypatch):
+    fragments(monkeypatch)
+    template = app.jinja_env.from_string(
+        "{% cache 'tile', id, tags=['venue:' ~ id] %}{{ render() }}{% endcache %}")
+    rendered = []
+
+    def render(id):
+        return template.render(id=id, render=lambda: rendered.append(id) or f'venue {id}')
+
+    assert [render(1), render(1), render(2)] == ['venue 1', 'venue 1', 'venue 2']
+    assert rendered == [1, 2]
+
+    fyyur.response_cache.invalidate('venue:1')
+    assert [render(1), render(2)] == ['venue 1', 'venue 2']
+    assert rendered == [1, 2, 1]
+
+
+def test_pages_are_the_same_with_fragment_caching(client, make, monkeypatch):
+    hop, petals = catalog(make)
+    paths = [f'/venues/{hop.id}', f'/artists/{petals.id}', '/shows']
+    plain = [client.get(path).data for path in paths]
+
+    fragments(monkeypatch)
+    assert [client.get(path).data for path in paths] == plain
+    assert [client.get(path).data for path in paths] == plain
+
+
+def test_compiled_templates_load_as_modules(app, tmp_path):
+    result = app.test_cli_runner().invoke(args=['compile-templates', '--output', str(tmp_path)])
+    assert result.exit_code == 0, result.output
+
+    compiled = Environment(loader=ModuleLoader(str(tmp_path)), extensions=['cache.FragmentCacheExtension'])
+    assert compiled.get_template('errors/404.html').name == 'errors/404.html'
+    assert len(list(tmp_path.iterdir())) == len(fyyur.template_sources.list_templates())
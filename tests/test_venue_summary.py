@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+import app as fyyur
+from conftest import postgres
+from test_queries import catalog
+
+
+# the summary rows as (venue id, upcoming count)
+def summary(app):
+    with app.app_context():
+        return fyyur.db.session.query(fyyur.VenueSummary.venue_id, fyyur.VenueSummary.upcoming_count) \
+            .order_by(fyyur.VenueSummary.venue_id).all()
+
+
+def test_refreshing_updates_the_summary_rows_in_place(app, make):
+    hop, petals = catalog(make)
+    before = summary(app)
+    make.show(hop, petals, days=3)
+
+    with app.app_context():
+        fyyur.refresh_venue_summary([hop.id, hop.id])
+        fyyur.refresh_venue_summary([hop.id])
+        fyyur.db.session.commit()
+    assert summary(app) == [(venue_id, count + 1 if venue_id == hop.id else count) for venue_id, count in before]
+
+    with app.app_context():
+        fyyur.refresh_venue_summary()
+        fyyur.db.session.commit()
+    assert summary(app) == [(venue_id, count + 1 if venue_id == hop.id else count) for venue_id, count in before]
+
+
+def test_deleting_a_venue_deletes_its_shows_and_summary(app, client, make):
+    hop, petals = catalog(make)
+    assert client.delete(f'/venues/{hop.id}').status_code == 204
+
+    with app.app_context():
+        assert fyyur.Venue.query.get(hop.id) is None
+        assert fyyur.Show.query.filter_by(venue_id=hop.id).count() == 0
+        assert fyyur.Show.query.count() == 2
+    assert hop.id not in [venue_id for venue_id, count in summary(app)]
+    assert b'The Musical Hop' not in client.get('/venues').data
+
+
+def test_a_failed_delete_says_so_and_keeps_the_venue(app, client, make, monkeypatch):
+    hop, petals = catalog(make)
+    assert client.delete('/venues/9999').status_code == 404
+
+    def fail(venue_ids=None):
+        raise RuntimeError('the summary is locked')
+
+    monkeypatch.setattr(fyyur, 'refresh_venue_summary', fail)
+    assert client.delete(f'/venues/{hop.id}').status_code == 500
+    with app.app_context():
+        assert fyyur.Venue.query.get(hop.id) is not None
+        assert fyyur.Show.query.filter_by(venue_id=hop.id).count() == 2
+
+
+# refreshes of the same venue from concurrent transactions all succeed
+def test_concurrent_refreshes_of_a_venue_do_not_collide(app, make):
+    hop = make.venue()
+    with app.app_context():
+        if not postgres():
+            pytest.skip('concurrent transactions need postgres')
+
+    errors = []
+
+    def refresh():
+        for _ in range(20):
+            with app.app_context():
+                try:
+                    fyyur.refresh_venue_summary([hop.id])
+                    fyyur.db.session.commit()
+                except Exception as error:
+                    errors.append(error)
+                    fyyur.db.session.rollback()
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert summary(app) == [(hop.id, 0)]
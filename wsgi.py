@@ -0,0 +1,26 @@
+# the production entry point, served by gunicorn with the settings in
+# gunicorn.conf.py:
+#
+#   gunicorn wsgi:app
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+import os
+import sys
+
+
+# load the app under the given settings profile, production unless FYYUR_ENV
+# says otherwise. app.py builds the one app of the process as it is imported,
+# so the first load fixes the profile, and asking for another one afterwards
+# is an error rather than a second app
+def load_app(env=None):
+    env = env or os.environ.get('FYYUR_ENV') or 'production'
+    loaded = sys.modules.get('app')
+    if loaded is not None and loaded.app.config['ENV'] != env:
+        raise RuntimeError('the app is already loaded with the {} settings'.format(loaded.app.config['ENV']))
+
+    os.environ['FYYUR_ENV'] = env
+    from app import app
+    return app
+
+
+app = load_app()